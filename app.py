@@ -1,24 +1,90 @@
 from os import getenv
+from time import perf_counter
 import click
 
-from fate import FastBot, FateCog, Database
-from fate.database.legacy import YAMLDatabase
+from fate import FastBot, ShardedFastBot, FateCog, Database, AsyncDatabase
+from fate.sharding import parse_shard_count, parse_shard_ids, check_shards
+from fate.metrics import metrics
+from fate.profiling import profiler
+from fate.coalesce import Coalescer
+from fate.parsing import Parser, rng
+from fate.parsing.parser import load_grammar, COMPILED_GRAMMAR
+from fate.database.legacy import YAMLDatabase, YAMLStream
+from fate.database import transfer
 
 
 DISCORD_TOKEN = getenv("DISCORD_TOKEN")
 DB_URL = getenv("DB_URL", "sqlite:///fate.db")
+PARSE_CACHE_SIZE = int(getenv("PARSE_CACHE_SIZE", "256"))
+DB_WORKERS = int(getenv("DB_WORKERS", "4"))
+PROFILE_CACHE_SIZE = int(getenv("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(getenv("PROFILE_CACHE_TTL", "300"))
+RNG_MODE = getenv("RNG_MODE", "fast")
+RNG_SEED = getenv("RNG_SEED")
+COALESCE_WINDOW = float(getenv("COALESCE_WINDOW", "0"))
+COALESCE_MAX_DELAY = float(getenv("COALESCE_MAX_DELAY", "1000"))
+DB_WAL = getenv("DB_WAL", "1") != "0"
+DB_SYNCHRONOUS = getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(getenv("DB_CACHE_SIZE", "65536"))
+DB_MMAP_SIZE = int(getenv("DB_MMAP_SIZE", "268435456"))
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "1") != "0"
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+METRICS = getenv("METRICS", "") not in ("", "0")
+METRICS_PORT = getenv("METRICS_PORT")
+PROFILE_RATE = float(getenv("PROFILE_RATE", "0"))
+PROFILE_DIR = getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(getenv("PROFILE_INTERVAL", "60"))
+FAST_CHANNEL_REFRESH = float(getenv("FAST_CHANNEL_REFRESH", "60"))
+SHARD_COUNT = getenv("SHARD_COUNT")
+SHARD_IDS = getenv("SHARD_IDS")
+
+database = Database(
+    DB_URL,
+    PROFILE_CACHE_SIZE,
+    PROFILE_CACHE_TTL,
+    wal=DB_WAL,
+    synchronous=DB_SYNCHRONOUS,
+    cache_size=DB_CACHE_SIZE,
+    mmap_size=DB_MMAP_SIZE,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_recycle=DB_POOL_RECYCLE
+)
 
-database = Database(DB_URL)
 
-cog = FateCog(database)
+def make_bot(shard_ids=None, shard_count=None, sharded=False):
+    """Create the bot (only needed by the start command).
 
-bot = FastBot(
-    database,
-    command_prefix="--",
-    fast_command=cog.roll
-)
+    Args:
+        shard_ids: IDs of the gateway shards to run, or None for all.
+        shard_count: Total number of shards, or None for Discord's recommendation.
+        sharded: Whether to shard the gateway connection at all.
+    """
+
+    # Run queries on a thread pool so they do not block the event loop
+    async_database = AsyncDatabase(database, DB_WORKERS)
+
+    cog = FateCog(async_database, Parser(cache_size=PARSE_CACHE_SIZE))
+
+    # Combine bursts of fast channel rolls into one message (window and cap in ms)
+    if COALESCE_WINDOW > 0:
+        coalescer = Coalescer(COALESCE_WINDOW / 1000, COALESCE_MAX_DELAY / 1000)
+    else:
+        coalescer = None
+
+    options = dict(command_prefix="--", fast_command=cog.roll, coalescer=coalescer)
 
-bot.add_cog(cog)
+    if sharded:
+        bot = ShardedFastBot(async_database, shard_ids=shard_ids, shard_count=shard_count, **options)
+    else:
+        bot = FastBot(async_database, **options)
+
+    bot.add_cog(cog)
+
+    return bot
 
 
 @click.group()
@@ -27,10 +93,54 @@ def cli():
 
 
 @cli.command()
-def start():
+@click.option("--metrics/--no-metrics", "enable_metrics", default=METRICS, help="Record latency metrics (shown by --stats).")
+@click.option("--metrics-port", type=int, default=METRICS_PORT, help="Serve metrics for Prometheus on this port.")
+@click.option("--profile-rate", type=click.FloatRange(0, 1), default=PROFILE_RATE, help="Fraction of commands to profile.")
+@click.option("--profile-dir", default=PROFILE_DIR, help="Directory profiles are dumped to.")
+@click.option("--profile-interval", type=float, default=PROFILE_INTERVAL, help="Seconds between profile dumps.")
+@click.option("--shard-count", default=SHARD_COUNT, help="Number of gateway shards, or \"auto\" for Discord's recommendation.")
+@click.option("--shard-ids", default=SHARD_IDS, help="Shards run by this process, e.g. \"0-3\" or \"0,2\" (default: all).")
+def start(enable_metrics, metrics_port, profile_rate, profile_dir, profile_interval, shard_count, shard_ids):
     """Run the bot."""
 
-    bot.run(DISCORD_TOKEN)
+    # Shard only if asked to, so small deployments keep a single connection
+    sharded = bool(shard_count or shard_ids)
+
+    try:
+        shard_count = parse_shard_count(shard_count)
+        shard_ids = parse_shard_ids(shard_ids)
+        check_shards(shard_ids, shard_count)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+    bot = make_bot(shard_ids, shard_count, sharded)
+
+    # Only cache fast channels of this process's guilds
+    if shard_ids is not None:
+        database.set_shards(shard_ids, shard_count)
+
+    rng.use(rng.make_source(RNG_MODE, RNG_SEED))
+
+    if enable_metrics or metrics_port is not None:
+        metrics.enabled = True
+    if metrics_port is not None:
+        metrics.serve(metrics_port)
+
+    if profile_rate:
+        profiler.configure(profile_rate, profile_dir, profile_interval)
+
+    # Preload fast channel flags in bulk, rather than on the first message
+    database.load_fast_channels()
+
+    # Reload them periodically, to pick up imports made while running
+    if FAST_CHANNEL_REFRESH > 0:
+        database.refresh_fast_channels(FAST_CHANNEL_REFRESH)
+
+    try:
+        bot.run(DISCORD_TOKEN)
+    finally:
+        if profile_rate:
+            profiler.dump()
 
 
 @cli.command()
@@ -40,13 +150,81 @@ def create_tables():
     database.create_tables()
 
 
+@cli.command()
+def compile_grammar():
+    """Compile the command grammar ahead of time."""
+
+    load_grammar(COMPILED_GRAMMAR)
+    click.echo(f"Grammar compiled to {COMPILED_GRAMMAR}")
+
+
 @cli.command()
 @click.argument("filename")
-def load_legacy(filename):
+@click.option("--stream", is_flag=True, help="Stream the file in resumable chunks (for very large files).")
+@click.option("--chunk-size", default=1000, help="Number of items per chunk when streaming.")
+def load_legacy(filename, stream, chunk_size):
     """Import data from legacy YAML file."""
 
-    legacy = YAMLDatabase(filename)
-    legacy.save_all(database)
+    if stream:
+        legacy = YAMLStream(filename, chunk_size)
+    else:
+        legacy = YAMLDatabase(filename)
+
+    stats = legacy.save_all(database)
+
+    click.echo(
+        f"Imported {stats['profiles']} profiles ({stats['entries']} entries) and "
+        f"{stats['channels']} fast channels in {stats['seconds']:.2f}s "
+        f"({stats['profiles_per_second']:.0f} profiles/s)."
+    )
+
+
+def data_format(filename, format):
+    """Return the data file format, guessing from the file extension if not given."""
+
+    if format is not None:
+        return format
+
+    return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+
+@cli.command()
+@click.argument("filename")
+@click.option("--format", type=click.Choice(["jsonl", "csv"]), help="File format (default: from extension).")
+@click.option("--batch-size", default=1000, help="Number of rows fetched from the database at once.")
+def export_data(filename, format, batch_size):
+    """Export all users, profiles, macros and channels to a file."""
+
+    start = perf_counter()
+    records = transfer.export_records(database, batch_size)
+
+    with open(filename, "w", newline="") as output_file:
+        if data_format(filename, format) == "csv":
+            count = transfer.write_csv(records, output_file)
+        else:
+            count = transfer.write_jsonl(records, output_file)
+
+    click.echo(f"Exported {count} records in {perf_counter() - start:.2f}s.")
+
+
+@cli.command()
+@click.argument("filename")
+@click.option("--format", type=click.Choice(["jsonl", "csv"]), help="File format (default: from extension).")
+@click.option("--batch-size", default=1000, help="Number of records written per transaction.")
+def import_data(filename, format, batch_size):
+    """Import (insert or update) data exported by export-data."""
+
+    start = perf_counter()
+
+    with open(filename, newline="") as input_file:
+        if data_format(filename, format) == "csv":
+            records = transfer.read_csv(input_file)
+        else:
+            records = transfer.read_jsonl(input_file)
+
+        count = transfer.import_records(database, records, batch_size)
+
+    click.echo(f"Imported {count} records in {perf_counter() - start:.2f}s.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+"""Concurrent database benchmark.
+
+Runs reader and writer threads against a SQLite file database, as the bot's
+database thread pool does, with the default engine and the tuned engine (WAL
+and pragmas):
+
+    $ python -m benchmarks.concurrency --readers 8 --writers 2 --seconds 5
+"""
+
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Thread, Event
+from time import perf_counter, sleep
+
+import click
+
+from fate.database import Database
+from fate.enums import Key
+
+
+# Engine options which leave SQLite's own defaults in place
+DEFAULT = {"wal": False, "synchronous": None, "cache_size": None, "mmap_size": None}
+TUNED = dict()
+
+USERS = 50
+
+# A few stats per profile, so that timings are dominated by the engine, not the ORM
+KEYS = [Key.WS, Key.BS, Key.S, Key.T, Key.AG]
+
+
+def make_database(url, options):
+    """File database with a profile for each user (profile cache disabled)."""
+
+    database = Database(url, 0, **options)
+    database.create_tables()
+
+    for discord_id in range(USERS):
+        database.new_profile(discord_id, "bob")
+        database.switch_profile(discord_id, "bob")
+        for key in KEYS:
+            database.update(discord_id, key, 40)
+
+    return database
+
+
+def worker(operation, users, stop, latencies, errors):
+    """Repeat an operation over the given users until stopped, recording each call's latency."""
+
+    count = 0
+
+    while not stop.is_set():
+        start = perf_counter()
+        try:
+            operation(users[count % len(users)])
+        except Exception:
+            errors.append(1)
+        latencies.append(perf_counter() - start)
+        count += 1
+
+
+def run(options, readers, writers, seconds):
+    """Run the benchmark, returning read/write throughput and latency."""
+
+    with TemporaryDirectory() as directory:
+
+        database = make_database(f"sqlite:///{path.join(directory, 'fate.db')}", options)
+
+        operations = {
+            "read": lambda discord_id: database.fetch_profile(discord_id).entries,
+            "write": lambda discord_id: database.update(discord_id, Key.AG, discord_id)
+        }
+
+        stop = Event()
+        results = {kind: ([], []) for kind in operations}
+
+        # Writers update separate users, so they do not race to create the same entries
+        threads = [
+            Thread(target=worker, args=(operations["read"], range(USERS), stop, *results["read"]))
+            for _ in range(readers)
+        ] + [
+            Thread(target=worker, args=(operations["write"], range(i, USERS, writers), stop, *results["write"]))
+            for i in range(writers)
+        ]
+
+        for thread in threads:
+            thread.start()
+        sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        database.engine.dispose()
+
+    summary = dict()
+
+    for kind, (latencies, errors) in results.items():
+        latencies.sort()
+        summary[kind] = {
+            "per_second": len(latencies) / seconds,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else 0.0,
+            "errors": len(errors)
+        }
+
+    return summary
+
+
+@click.command()
+@click.option("--readers", default=8, help="Number of reader threads.")
+@click.option("--writers", default=2, help="Number of writer threads.")
+@click.option("--seconds", default=5.0, help="Duration of each run.")
+def main(readers, writers, seconds):
+    """Compare the default and tuned SQLite engines under concurrent load."""
+
+    click.echo(f"{'engine':<10}{'reads/s':>12}{'read p99':>12}{'writes/s':>12}{'write p99':>12}{'errors':>8}")
+
+    for name, options in (("default", DEFAULT), ("tuned", TUNED)):
+        result = run(options, readers, writers, seconds)
+        read, write = result["read"], result["write"]
+        click.echo(
+            f"{name:<10}{read['per_second']:>12.0f}{read['p99_ms']:>10.1f}ms"
+            f"{write['per_second']:>12.0f}{write['p99_ms']:>10.1f}ms{read['errors'] + write['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
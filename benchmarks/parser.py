@@ -0,0 +1,51 @@
+"""Dice equation parsing benchmark.
+
+Compares trying the skill test rule before the dice rule (the old behaviour)
+with dispatching each command straight to the rule it matches.
+
+    $ python -m benchmarks.parser
+"""
+
+from timeit import repeat
+
+from fate.parsing import Parser
+
+
+COMMANDS = [
+    "3d10T+SB",
+    "2d10 + 4",
+    "d5 - 2 * 4",
+    "1d10 + 1d5 + AGB - 3",
+]
+
+
+def sequential(parser, raw):
+    """Parse raw the old way, trying the skill test rule first."""
+
+    return (
+        parser._parse(raw, "test_start") or
+        parser._parse(raw, "dice_start")
+    )
+
+
+def measure(function, number=2000):
+    """Return best per-call time of function in microseconds."""
+
+    return min(repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+
+    # Disable the cache so every call does a full parse
+    parser = Parser(cache_size=0)
+
+    print(f"{'command':<24}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+
+    for raw in COMMANDS:
+        before = measure(lambda: sequential(parser, raw))
+        after = measure(lambda: parser.parse(raw))
+        print(f"{raw:<24}{before:>14.1f}{after:>14.1f}{before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Parser start-up benchmark.
+
+Compares compiling the grammar on every start with loading the compiled
+tables written by `app.py compile-grammar`.
+
+    $ python -m benchmarks.startup
+"""
+
+from tempfile import TemporaryDirectory
+from timeit import repeat
+from os import path
+
+from fate.parsing import Parser
+
+
+def measure(function, number=20):
+    """Return best per-call time of function in milliseconds."""
+
+    return min(repeat(function, number=number, repeat=5)) / number * 1e3
+
+
+def main():
+
+    with TemporaryDirectory() as directory:
+
+        compiled = path.join(directory, "fate.lark.cache")
+        Parser(compiled=compiled)
+
+        before = measure(lambda: Parser(compiled=None))
+        after = measure(lambda: Parser(compiled=compiled))
+
+    print(f"compile grammar: {before:.1f} ms")
+    print(f"load compiled:   {after:.1f} ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
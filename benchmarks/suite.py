@@ -0,0 +1,240 @@
+"""End-to-end benchmark suite for parsing, rolling, rendering and storage.
+
+Results are printed as a table and can be written as JSON, to compare runs
+across releases:
+
+    $ python -m benchmarks.suite --output before.json
+    $ python -m benchmarks.suite --compare before.json
+"""
+
+import json
+import platform
+from datetime import datetime, timezone
+from statistics import median
+from timeit import Timer
+
+import click
+
+from fate.database import Database
+from fate.enums import Key, Attack
+from fate.parsing import Parser, rng
+from fate.parsing.rolls import SkillTest, DiceTerm, BonusTerm, DiceEquation, describe, hit_description, test
+
+
+BENCHMARKS = dict()
+
+# Command shapes from tests/parsing/test_parser.py
+COMMANDS = [
+    "=gun",
+    "athletics on agility +20",
+    "AFeltics on Ag",
+    " 10  +20-5+3 +17",
+    "  #Other \t\n +30 -50",
+    " agility !! * 11 ",
+    " #bob parry on weapon skill + 20 !!! ",
+    "3d10T+SB",
+    "2d10 + 4 * 5",
+]
+
+
+class Profile:
+    """Minimal stand-in for a player profile."""
+
+    long_name = "Benchmark"
+
+    def get(self, key, default=None):
+        return default
+
+
+def benchmark(name):
+    """Register a benchmark.
+
+    The decorated function does any setup and returns the callable to time.
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+for command in COMMANDS:
+
+    @benchmark(f"parse[{' '.join(command.split())}]")
+    def parse_uncached(command=command):
+        parser = Parser(cache_size=0)
+        return lambda: parser.parse(command)
+
+
+@benchmark("parse[cached]")
+def parse_cached():
+    parser = Parser()
+    return lambda: parser.parse("athletics on agility +20")
+
+
+for repeats in (1, 30):
+
+    @benchmark(f"skill_test[x{repeats}]")
+    def skill_test(repeats=repeats):
+        request = SkillTest(10, Key.AG, Key.DODGE, None, repeats)
+        profile = Profile()
+        return lambda: request(profile)
+
+    @benchmark(f"skill_test_full_auto[x{repeats}]")
+    def full_auto(repeats=repeats):
+        request = SkillTest(10, Key.BS, None, Attack.FULL, repeats)
+        profile = Profile()
+        return lambda: request(profile)
+
+    @benchmark(f"dice_equation[x{repeats}]")
+    def dice_equation(repeats=repeats):
+        request = DiceEquation([DiceTerm(2, 10, True), BonusTerm(Key.S, 1), 3], repeats)
+        profile = Profile()
+        return lambda: request(profile)
+
+
+@benchmark("describe_full_auto[x30]")
+def describe_full_auto():
+    rolls = [(roll, 9) for roll in range(1, 31)]
+    return lambda: describe(95, rolls, Attack.FULL)
+
+
+@benchmark("hit_description_full_auto[9 hits]")
+def hit_description_full_auto():
+    return lambda: hit_description(34, 9, Attack.FULL)
+
+
+@benchmark("test")
+def single_test():
+    return lambda: test(45)
+
+
+for raw in ("strngth", "Will POWER", "navigate surfce", "AAA?????????zzzzzzz"):
+
+    @benchmark(f"key_get_fuzzy[{raw}]")
+    def key_get(raw=raw):
+        return lambda: Key.get(raw, fuzzy=True)
+
+
+def make_database():
+    """In-memory database with one user and an active profile."""
+
+    database = Database("sqlite://")
+    database.create_tables()
+    database.new_profile(1, "bob")
+    database.switch_profile(1, "bob")
+    for key in Key:
+        database.update(1, key, 40)
+    database.save_macro(1, "gun", "bs !!")
+
+    return database
+
+
+@benchmark("db.fetch_user")
+def fetch_user():
+    database = make_database()
+    return lambda: database.fetch_user(1)
+
+
+@benchmark("db.fetch_profile")
+def fetch_profile():
+    database = make_database()
+    return lambda: database.fetch_profile(1)
+
+
+@benchmark("db.fetch_snapshot[cached]")
+def fetch_snapshot():
+    database = make_database()
+    return lambda: database.fetch_snapshot(1)
+
+
+@benchmark("db.update")
+def update():
+    database = make_database()
+    return lambda: database.update(1, Key.AG, 45)
+
+
+@benchmark("db.fetch_macro")
+def fetch_macro():
+    database = make_database()
+    return lambda: database.fetch_macro(1, "gun")
+
+
+@benchmark("db.is_fast")
+def is_fast():
+    database = make_database()
+    return lambda: database.is_fast(1)
+
+
+@benchmark("db.toggle_fast")
+def toggle_fast():
+    database = make_database()
+    return lambda: database.toggle_fast(1)
+
+
+def measure(function, repeat=5, target=0.05):
+    """Time function, returning per-call times (in microseconds) of each repeat."""
+
+    timer = Timer(function)
+    number, _ = timer.autorange()
+
+    # Scale down to roughly the target time per repeat
+    number = max(1, int(number * target / 0.2))
+
+    return number, [total / number * 1e6 for total in timer.repeat(repeat, number)]
+
+
+def run(selected):
+    """Run the selected benchmarks, returning the results as a dictionary."""
+
+    results = dict()
+
+    for name in selected:
+        number, times = measure(BENCHMARKS[name]())
+        results[name] = {
+            "number": number,
+            "best_us": min(times),
+            "median_us": median(times)
+        }
+        click.echo(f"{name:<48}{min(times):>12.2f} us")
+
+    return results
+
+
+@click.command()
+@click.option("--output", "-o", type=click.Path(), help="Write results to a JSON file.")
+@click.option("--compare", "-c", type=click.Path(exists=True), help="Compare with a previous JSON file.")
+@click.option("--filter", "-k", "pattern", default="", help="Only run benchmarks whose name contains this.")
+def main(output, compare, pattern):
+    """Run the benchmark suite."""
+
+    # Draw the same dice on every run
+    rng.use(rng.make_source("seeded", 0))
+
+    selected = [name for name in BENCHMARKS if pattern in name]
+    results = run(selected)
+
+    if output is not None:
+        with open(output, "w") as output_file:
+            json.dump({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results
+            }, output_file, indent=2)
+
+    if compare is not None:
+        with open(compare) as compare_file:
+            previous = json.load(compare_file)["results"]
+
+        click.echo(f"\n{'benchmark':<48}{'before':>12}{'after':>12}{'change':>10}")
+        for name, result in results.items():
+            if name in previous:
+                before = previous[name]["best_us"]
+                after = result["best_us"]
+                click.echo(f"{name:<48}{before:>12.2f}{after:>12.2f}{after / before - 1:>+10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
-from .bot import FastBot
+from .bot import FastBot, ShardedFastBot
 from .cog import FateCog
-from .database import Database
\ No newline at end of file
+from .database import Database, AsyncDatabase
\ No newline at end of file
@@ -1,31 +1,68 @@
-from discord.ext.commands import Bot
+from discord.ext.commands import AutoShardedBot, Bot
 
+from .sharding import check_shards
+
+
+class FastMixin:
+    """Fast channel support, shared by FastBot and ShardedFastBot.
 
-class FastBot(Bot):
-    """Extension of the Discord Bot class.
-    
     Supports a "fast" mode, where certain channel IDs can be labelled in
     the database for special treatment. Any messages sent on fast channels
     are, by default, treated as calls to the `fast_command` command (if set).
+
+    Replies to fast channel messages are combined by the `coalescer` (if set),
+    so bursts of rolls are sent as one message.
+
+    The database should be an AsyncDatabase.
     """
 
     def __init__(self, database, *args, **kwargs):
 
         self.database = database
         self.fast_command = kwargs.pop("fast_command", None)
+        self.coalescer = kwargs.pop("coalescer", None)
 
         super().__init__(*args, **kwargs)
 
 
-    async def get_context(self, message):
+    async def get_context(self, message, **kwargs):
 
-        context = await super().get_context(message)
+        context = await super().get_context(message, **kwargs)
 
         # If this is a fast channel, apply default command
         if (
             context.invoked_with is None and
-            self.database.is_fast(context.channel.id)
+            await self.database.is_fast(context.channel.id)
         ):
             context.command = self.fast_command
-        
-        return context
\ No newline at end of file
+
+        return context
+
+
+
+class FastBot(FastMixin, Bot):
+    """Extension of the Discord Bot class, with fast channels (see FastMixin).
+
+    Runs a single gateway connection (or one given shard, with `shard_id` and
+    `shard_count`).
+    """
+
+
+
+class ShardedFastBot(FastMixin, AutoShardedBot):
+    """Extension of the Discord AutoShardedBot class, with fast channels (see FastMixin).
+
+    Runs several gateway shards in one process: every shard if `shard_ids` is
+    None (with Discord's recommended shard count if `shard_count` is also None),
+    or else only the given shards out of `shard_count`.
+
+    Note:
+        When running a range of shards, the database should only cache the fast
+        channels of their guilds (see Database.set_shards).
+    """
+
+    def __init__(self, database, *args, **kwargs):
+
+        check_shards(kwargs.get("shard_ids"), kwargs.get("shard_count"))
+
+        super().__init__(database, *args, **kwargs)
\ No newline at end of file
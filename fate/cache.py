@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class LRUCache:
+    """Bounded mapping which evicts the least recently used entry when full.
+
+    Entries can optionally expire a fixed number of seconds after being stored.
+    Keeps hit, miss, eviction and expiry counters so that the cache can be sized.
+    A maximum size of zero disables caching entirely.
+
+    By default the maximum size is a number of entries. Given a `weigh` function,
+    it bounds the total weight of the values instead (e.g. their length), and
+    values heavier than the maximum are not stored.
+
+    Note:
+        Safe to share between threads (e.g. the AsyncDatabase thread pool).
+    """
+
+    def __init__(self, maxsize=256, ttl=None, weigh=None):
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigh = weigh
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+        # Total weight of the stored values
+        self.weight = 0
+
+        # Bumped by invalidate, so values loaded before an invalidation are not stored
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+    def get(self, key, default=None):
+        """Return the value stored under key, marking it as recently used."""
+
+        with self.lock:
+            try:
+                value, expires, _ = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires is not None and expires <= monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self.data.move_to_end(key)
+            self.hits += 1
+
+        return value
+
+
+    def put(self, key, value):
+        """Store value under key, evicting the oldest entry if needed."""
+
+        if self.maxsize <= 0:
+            return
+
+        with self.lock:
+            self._store(key, value)
+
+
+    def put_if(self, key, value, generation):
+        """Store value under key, unless the cache has been invalidated since `generation`.
+
+        Returns:
+            Whether the value was stored.
+        """
+
+        if self.maxsize <= 0:
+            return False
+
+        with self.lock:
+            if generation != self.generation:
+                return False
+
+            self._store(key, value)
+
+        return True
+
+
+    def _store(self, key, value):
+
+        expires = None if self.ttl is None else monotonic() + self.ttl
+        weight = 1 if self.weigh is None else self.weigh(value)
+
+        self._remove(key)
+
+        if weight > self.maxsize:
+            return
+
+        self.data[key] = value, expires, weight
+        self.weight += weight
+
+        while self.weight > self.maxsize:
+            self._remove(next(iter(self.data)))
+            self.evictions += 1
+
+
+    def _remove(self, key, default=None):
+
+        value, _, weight = self.data.pop(key, (default, None, 0))
+        self.weight -= weight
+
+        return value
+
+
+    def pop(self, key, default=None):
+        """Remove and return the value stored under key."""
+
+        with self.lock:
+            return self._remove(key, default)
+
+
+    def invalidate(self, keys):
+        """Remove the entries stored under keys, and start a new generation."""
+
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self._remove(key)
+
+
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+
+        with self.lock:
+            self.data.clear()
+            self.weight = 0
+
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+
+        lookups = self.hits + self.misses
+
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+    def __contains__(self, key):
+        return key in self.data
+
+
+    def __len__(self):
+        return len(self.data)
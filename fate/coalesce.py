@@ -0,0 +1,174 @@
+from asyncio import Lock, get_running_loop, shield, sleep
+from discord import Color, Embed
+
+from .metrics import metrics
+
+
+# Discord embed limits
+MAX_FIELDS = 25
+MAX_NAME = 256
+MAX_VALUE = 1024
+MAX_TOTAL = 6000
+
+
+class Batch:
+    """Embeds waiting to be sent to one channel."""
+
+    def __init__(self, context, now):
+
+        self.context = context
+        self.start = now
+        self.last = now
+        self.embeds = list()
+        self.sent = get_running_loop().create_future()
+
+
+
+class Coalescer:
+    """Combines replies sent to the same channel in quick succession into one message.
+
+    Each reply waits until no other reply has arrived in its channel for `window`
+    seconds, but never more than `max_delay` seconds after the first reply of its
+    batch. Batches in each channel are sent in order.
+    """
+
+    def __init__(self, window=0.25, max_delay=1.0):
+
+        self.window = window
+        self.max_delay = max_delay
+        self.batches = dict()
+
+        # Per-channel send locks, and the number of flushes using each
+        self.locks = dict()
+        self.flushing = dict()
+
+
+    async def send(self, context, embed):
+        """Send an embed to the context's channel, combined with any others in its batch."""
+
+        loop = get_running_loop()
+        channel_id = context.channel.id
+        batch = self.batches.get(channel_id)
+
+        if batch is None:
+            batch = self.batches[channel_id] = Batch(context, loop.time())
+            loop.create_task(self._flush_later(channel_id, batch))
+
+        batch.last = loop.time()
+        batch.embeds.append(embed)
+
+        if len(batch.embeds) >= MAX_FIELDS:
+            loop.create_task(self.flush(channel_id, batch))
+
+        # Wait for the batch to be sent, so any error reaches the command
+        # (shielded, as the other commands in the batch wait on the same future)
+        await shield(batch.sent)
+
+
+    async def _flush_later(self, channel_id, batch):
+
+        loop = get_running_loop()
+
+        while True:
+            delay = min(batch.last + self.window, batch.start + self.max_delay) - loop.time()
+            if delay <= 0:
+                break
+            await sleep(delay)
+
+        await self.flush(channel_id, batch)
+
+
+    async def flush(self, channel_id, batch):
+        """Send a batch, unless it has already been sent."""
+
+        if self.batches.get(channel_id) is not batch:
+            return
+
+        del self.batches[channel_id]
+
+        # Locks are acquired in order, so batches are sent in the order they were made
+        lock = self.locks.setdefault(channel_id, Lock())
+        self.flushing[channel_id] = self.flushing.get(channel_id, 0) + 1
+
+        try:
+            async with lock:
+                for embed in combine(batch.embeds):
+                    with metrics.timer("fate_send_seconds", "fast-roll"):
+                        await batch.context.send(embed=embed)
+        except Exception as error:
+            if not batch.sent.done():
+                batch.sent.set_exception(error)
+        else:
+            if not batch.sent.done():
+                batch.sent.set_result(None)
+        finally:
+            # Drop the lock once no batch in the channel is being sent
+            self.flushing[channel_id] -= 1
+            if not self.flushing[channel_id]:
+                del self.flushing[channel_id]
+                del self.locks[channel_id]
+
+
+
+def field(embed):
+    """Return the (name, value) of a field showing an embed, or None if it does not fit."""
+
+    name = embed.author.name or "Roll"
+    if embed.footer.text:
+        name = f"{name} | {embed.footer.text}"
+
+    if (
+        len(name) > MAX_NAME
+        or not embed.description
+        or len(embed.description) > MAX_VALUE
+    ):
+        return None
+
+    return name, embed.description
+
+
+def combine(embeds):
+    """Yield the fewest embeds which show the given embeds in order, one field each.
+
+    Embeds which do not fit in a field are yielded unchanged, as are lone embeds.
+    """
+
+    group = list()
+    size = 0
+
+    for embed in embeds:
+
+        fields = field(embed)
+
+        if group and (
+            fields is None
+            or len(group) >= MAX_FIELDS
+            or size + len(fields[0]) + len(fields[1]) > MAX_TOTAL
+        ):
+            yield merge(group)
+            group = list()
+            size = 0
+
+        if fields is None:
+            yield embed
+        else:
+            group.append((embed, fields))
+            size += len(fields[0]) + len(fields[1])
+
+    if group:
+        yield merge(group)
+
+
+def merge(group):
+    """Merge (embed, field) pairs into one embed."""
+
+    if len(group) == 1:
+        return group[0][0]
+
+    colours = {embed.colour for embed, _ in group}
+    combined = Embed(colour=colours.pop() if len(colours) == 1 else Color.blue())
+
+    for _, (name, value) in group:
+        combined.add_field(name=name, value=value, inline=False)
+
+    return combined
\ No newline at end of file
@@ -1,9 +1,55 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from discord import Embed
 from discord.ext import commands
 
 from .parsing import Parser
+from .parsing.rolls import DiceEquation
+from .parsing.odds import odds
 from .enums import Key
+from .metrics import metrics
+from .profiling import profiler
+
+
+async def send_response(context, response, command):
+    """Format a command response as a Discord embed and send it."""
+
+    # If no response, then give a :warning: react instead
+    if response is None:
+        with metrics.timer("fate_send_seconds", command):
+            await context.message.add_reaction("\N{WARNING SIGN}\N{VARIATION SELECTOR-16}")
+        return
+
+    # String responses are used as embed descriptions
+    if isinstance(response, str):
+        response = {"description": response}
+
+
+    # Deal with author, footer, and profile arguments
+    author = response.pop("author", None) or context.author.name
+    footer = response.pop("footer", None)
+    profile = response.pop("profile", None)
+    if profile is not None:
+        author = f"{author} as {profile}"
+
+    # Create the embed
+    embed = Embed(**response)
+    embed.set_author(name=author, icon_url=context.author.avatar_url)
+    if footer is not None:
+        embed.set_footer(text=footer)
+
+    # Fast rolls may be combined with others sent to the same channel at about the same time
+    if (
+        command == "fast-roll"
+        and context.bot.coalescer is not None
+    ):
+        await context.bot.coalescer.send(context, embed)
+        return
+
+    # Send embed
+    with metrics.timer("fate_send_seconds", command):
+        await context.send(embed=embed)
 
 
 def format_response(method):
@@ -12,45 +58,59 @@ def format_response(method):
     @wraps(method)
     async def wrapper(self, context, *args, **kwargs):
 
-        response = await method(self, context, *args, **kwargs)
+        # Fast channel rolls are not invoked through a command
+        command = "fast-roll" if context.invoked_with is None else context.command.name
 
-        # If no response, then give a :warning: react instead
-        if response is None:
-            await context.message.add_reaction("\N{WARNING SIGN}\N{VARIATION SELECTOR-16}")
-            return
+        with metrics.timer("fate_command_seconds", command), profiler.command(command):
 
-        # String responses are used as embed descriptions
-        if isinstance(response, str):
-            response = {"description": response}
+            try:
+                response = await method(self, context, *args, **kwargs)
+            except Exception:
+                metrics.increment("fate_command_errors_total", command)
+                raise
 
-
-        # Deal with author, footer, and profile arguments
-        author = response.pop("author", None) or context.author.name
-        footer = response.pop("footer", None)
-        profile = response.pop("profile", None)
-        if profile is not None:
-            author = f"{author} as {profile}"
-
-        # Create the embed
-        embed = Embed(**response)
-        embed.set_author(name=author, icon_url=context.author.avatar_url)
-        if footer is not None:
-            embed.set_footer(text=footer)
-
-        # Send embed
-        await context.send(embed=embed)
+            with profiler.phase("render"):
+                await send_response(context, response, command)
     
     return wrapper
 
 
 
 class FateCog(commands.Cog):
-    """Cog class for making a Fate Bot."""
+    """Cog class for making a Fate Bot.
     
-    def __init__(self, database):
+    Expects an AsyncDatabase, so that queries do not block the event loop.
+    """
+    
+    def __init__(self, database, parser=None, odds_workers=1):
 
         self.database = database
-        self.parser = Parser()
+        self.parser = Parser() if parser is None else parser
+
+        # Exact odds are CPU-bound, so they get their own pool rather than holding up queries
+        self.odds_executor = ThreadPoolExecutor(odds_workers, thread_name_prefix="odds")
+
+
+    async def load_macro(self, discord_id, macro_name):
+        """Load the parsed request of a saved command, and the profile it needs (if loaded).
+
+        The request is None if there is no such macro.
+        """
+
+        stored_command, request, profile = await self.database.resolve_macro(discord_id, macro_name)
+
+        # Parse macros saved with an older grammar (or none), and store the result
+        if (
+            stored_command is not None
+            and request is None
+        ):
+            with profiler.phase("parse"):
+                request = self.parser.parse(stored_command)
+
+            if request is not None:
+                await self.database.compile_macro(discord_id, macro_name, stored_command, request)
+
+        return request, profile
 
 
     @commands.command(name="roll")
@@ -59,31 +119,65 @@ class FateCog(commands.Cog):
         """Perform a roll."""
 
         discord_id = context.author.id
-        request = self.parser.parse(arg)
+        with profiler.phase("parse"):
+            request = self.parser.parse(arg)
 
-        # If this is a macro command, load it
-        if isinstance(request, str):
-            macro_name = request
-            stored_command = self.database.fetch_macro(discord_id, macro_name)
+        profile = None
 
-            # Stop if no macro found
-            if stored_command is None:
-                return None
-            
-            request = self.parser.parse(stored_command)
+        # If this is a macro command, load it (and its profile, in the same session)
+        if isinstance(request, str):
+            request, profile = await self.load_macro(discord_id, request)
 
-        # Stop if request could not be parsed
+        # Stop if request could not be parsed (or the macro was not found)
         if request is None:
             return None
         
         # Only load profile if needed
-        if request.is_complex:
-            profile = self.database.fetch_profile(discord_id, request.profile_name)
-        else:
-            profile = None
+        if (
+            request.is_complex
+            and profile is None
+        ):
+            profile = await self.database.fetch_snapshot(discord_id, request.profile_name)
 
         # Invoke request
-        return request(profile)
+        with profiler.phase("roll"):
+            return request(profile)
+
+
+    @commands.command(name="odds")
+    @format_response
+    async def show_odds(self, context, *, arg):
+        """Show the odds of a dice roll (e.g. "2d10T+SB >= 15")."""
+
+        discord_id = context.author.id
+        raw, _, raw_target = arg.partition(">=")
+        request = self.parser.parse(raw)
+        profile = None
+
+        # If this is a macro command, load it
+        if isinstance(request, str):
+            request, profile = await self.load_macro(discord_id, request)
+
+        # Odds are only available for dice equations
+        if not isinstance(request, DiceEquation):
+            return None
+
+        try:
+            target = int(raw_target) if raw_target.strip() else None
+        except ValueError:
+            return None
+
+        if (
+            request.is_complex
+            and profile is None
+        ):
+            profile = await self.database.fetch_snapshot(discord_id, request.profile_name)
+
+        # Exact odds can take a while, so they are worked out off the event loop
+        with profiler.phase("roll"):
+            return await get_running_loop().run_in_executor(
+                self.odds_executor, odds, request, profile, target
+            )
 
 
     @commands.command(name="set")
@@ -97,7 +191,7 @@ class FateCog(commands.Cog):
         if key is None:
             return f"No characteristic or skill named \"{raw_key}\"."
 
-        profile = self.database.update(discord_id, key, value)
+        profile = await self.database.update(discord_id, key, value)
 
         if profile is not None:
             return  f"{key} on profile `{profile.name}` set to `{value}`."
@@ -112,7 +206,7 @@ class FateCog(commands.Cog):
 
         discord_id = context.author.id
 
-        exists = self.database.rename_profile(discord_id, profile_name, long_name)
+        exists = await self.database.rename_profile(discord_id, profile_name, long_name)
 
         if exists:
             return f"Profile `{profile_name.lower()}` renamed \"{long_name}\"."
@@ -126,7 +220,7 @@ class FateCog(commands.Cog):
         """Load a player profile."""
 
         discord_id = context.author.id
-        profile = self.database.switch_profile(discord_id, profile_name)
+        profile = await self.database.switch_profile(discord_id, profile_name)
 
         if profile is not None:
             return f"Now playing as {profile.long_name}."
@@ -143,7 +237,7 @@ class FateCog(commands.Cog):
             return "Profile names can only contain letters and numbers."
 
         discord_id = context.author.id
-        profile = self.database.new_profile(discord_id, profile_name, long_name)
+        profile = await self.database.new_profile(discord_id, profile_name, long_name)
 
         if profile is not None:
             return f"Profile `{profile.name}` created successfully!"
@@ -157,7 +251,7 @@ class FateCog(commands.Cog):
         """Display current player profile."""
 
         discord_id = context.author.id
-        profile = self.database.fetch_profile(discord_id)
+        profile = await self.database.fetch_profile(discord_id)
 
         if profile is not None:
             return "\n".join(f"{key} = {entry.value}" for key, entry in profile.entries.items()) ## TODO Refactor
@@ -171,9 +265,9 @@ class FateCog(commands.Cog):
         """List all player profiles."""
 
         discord_id = context.author.id
-        user = self.database.fetch_user(discord_id)
+        names = await self.database.list_profiles(discord_id)
 
-        return "Profiles: " + ", ".join(f"`{name}`" for name in user.all_profiles) ## TODO Refactor
+        return "Profiles: " + ", ".join(f"`{name}`" for name in names)
 
 
     @commands.command(name="toggle-fast")
@@ -182,7 +276,8 @@ class FateCog(commands.Cog):
         """Toggle the fast-roll setting on current channel."""
 
         channel = context.channel.id
-        enabled = self.database.toggle_fast(channel)
+        guild = context.guild.id if context.guild is not None else None
+        enabled = await self.database.toggle_fast(channel, guild)
 
         return f"Fast mode **{'enabled' if enabled else 'disabled'}**."
 
@@ -203,6 +298,39 @@ class FateCog(commands.Cog):
         elif isinstance(request, str):
             return "Macros cannot call other macros."
 
-        self.database.save_macro(discord_id, macro_name, command)
+        await self.database.save_macro(discord_id, macro_name, command, request)
+
+        return f"Macro `{macro_name.lower()}` saved successfully."
 
-        return f"Macro `{macro_name.lower()}` saved successfully."
\ No newline at end of file
+
+    @commands.command(name="stats")
+    @commands.is_owner()
+    @format_response
+    async def show_stats(self, context):
+        """Show latency and cache statistics (bot owner only)."""
+
+        if not metrics.enabled:
+            return "Metrics are disabled."
+
+        lines = list()
+
+        for name, title in (
+            ("fate_command_seconds", "Commands"),
+            ("fate_parse_seconds", "Parsing"),
+            ("fate_db_seconds", "Database"),
+            ("fate_send_seconds", "Replies")
+        ):
+            summary = metrics.summary(name)
+            if summary:
+                lines.append(f"**{title}**")
+                lines.extend(
+                    f"`{label}`: {count} | mean `{mean * 1000:.1f}ms` | "
+                    f"p50 `{p50 * 1000:g}ms` | p95 `{p95 * 1000:g}ms`"
+                    for label, count, mean, p50, p95 in summary
+                )
+
+        for title, cache in (("Parse cache", self.parser.cache), ("Profile cache", self.database.profiles)):
+            stats = cache.stats()
+            lines.append(f"**{title}**: {stats['size']}/{stats['maxsize']} | hit rate `{stats['hit_rate']:.1%}`")
+
+        return {"description": "\n".join(lines), "footer": "Stats"}
\ No newline at end of file
@@ -0,0 +1,73 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ..profiling import profiler
+
+
+class AsyncDatabase:
+    """Asynchronous facade for a Database.
+
+    Each method of the wrapped database is exposed as a coroutine which runs the
+    method on a bounded thread pool, so queries do not block the event loop and
+    concurrent requests do not wait on each other's I/O.
+    """
+
+    def __init__(self, database, max_workers=4):
+
+        self.database = database
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="database")
+
+
+    async def run(self, method, *args, **kwargs):
+        """Run a synchronous method on the thread pool and await the result."""
+
+        loop = get_running_loop()
+
+        with profiler.phase("db"):
+            return await loop.run_in_executor(self.executor, partial(method, *args, **kwargs))
+
+
+    async def is_fast(self, channel_id):
+        """Return is_fast flag for specified channel."""
+
+        # Once loaded, the flags are held in memory so the thread pool can be skipped
+        if self.database.fast_channels is not None:
+            return self.database.is_fast(channel_id)
+
+        return await self.run(self.database.is_fast, channel_id)
+
+
+    async def fetch_snapshot(self, discord_id, profile_name=None):
+        """Fetch a read-only snapshot of a player profile, using the profile cache."""
+
+        # Cache hits are answered from memory, skipping the thread pool
+        snapshot = self.database.cached_snapshot(discord_id, profile_name)
+
+        if snapshot is None:
+            snapshot = await self.run(self.database.load_snapshot, discord_id, profile_name)
+
+        return snapshot
+
+
+    def close(self):
+        """Wait for pending queries and shut down the thread pool."""
+
+        self.executor.shutdown()
+
+
+    def __getattr__(self, name):
+
+        method = getattr(self.database, name)
+
+        # Plain attributes (e.g. caches) are passed through
+        if not callable(method):
+            return method
+
+        async def wrapper(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+
+        return wrapper
@@ -1,8 +1,39 @@
 from functools import wraps
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from threading import Event, Lock, Thread
+from sqlalchemy import inspect, text, select, update
+from sqlalchemy.orm import sessionmaker, joinedload, selectinload
 
+from .engine import make_engine
 from .models import Base, User, Profile, Entry, Channel, Macro
+from .snapshots import ProfileSnapshot
+from ..cache import LRUCache
+from ..parsing import serialise
+from ..metrics import metrics
+from ..sharding import shard_for
+
+
+def mark_stale(session, discord_id, profile_name, active=False):
+    """Mark a player profile to be dropped from the profile cache once the session commits.
+    
+    Args:
+        session: The session making the change.
+        discord_id: Discord ID of the profile's user.
+        profile_name: Name of the changed profile.
+        active: Is the profile (or was it, before the change) the user's active profile?
+    """
+
+    stale = session.info.setdefault("stale_profiles", set())
+    stale.add((discord_id, profile_name))
+
+    # Active profiles are also cached without a name
+    if active:
+        stale.add((discord_id, None))
+
+
+def mark_fast(session, channel_id, is_fast):
+    """Record a channel's new is_fast flag, to be written to the fast channel cache once the session commits."""
+
+    session.info.setdefault("fast_channels", dict())[channel_id] = is_fast
 
 
 def session_context(method):
@@ -18,9 +49,19 @@ def session_context(method):
 
         if kwargs.get("session") is None:
             # No existing context, so wrap in a session
-            with self.Session.begin() as session:
-                kwargs["session"] = session
-                result = method(self, *args, **kwargs)
+            with metrics.timer("fate_db_seconds", method.__name__):
+                with self.Session.begin() as session:
+                    kwargs["session"] = session
+                    result = method(self, *args, **kwargs)
+
+            # Changes are now committed, so invalidate any cached copies
+            stale = session.info.get("stale_profiles")
+            if stale:
+                self.invalidate_profiles(stale)
+
+            fast = session.info.get("fast_channels")
+            if fast:
+                self.update_fast_channels(fast)
         else:
             # Pass through existing session context
             result = method(self, *args, **kwargs)
@@ -33,26 +74,70 @@ def session_context(method):
 
 class Database:
     
-    def __init__(self, url):
-        """Create a database configuration."""
+    def __init__(self, url, profile_cache_size=1024, profile_cache_ttl=300, **engine_options):
+        """Create a database configuration.
+        
+        Args:
+            url: Database URL.
+            profile_cache_size: Maximum number of profile snapshots to cache.
+            profile_cache_ttl: Number of seconds a profile snapshot may be cached for.
+            **engine_options: SQLite pragma and connection pool options (see make_engine).
+        """
 
-        self.engine = create_engine(url)
+        self.engine = make_engine(url, **engine_options)
 
         # Disabling expire_on_commit allows returned data to be accessed outside a session
         self.Session = sessionmaker(self.engine, expire_on_commit=False)
 
+        # Discord IDs of fast channels, loaded on first use
+        self.fast_channels = None
+
+        # Guards swapping in a reloaded set of fast channels; writes counts committed toggles
+        self.fast_lock = Lock()
+        self.fast_writes = 0
+
+        # Gateway shards served by this process (None for all), which limit the fast channels cached
+        self.shard_ids = None
+        self.shard_count = None
+
+        # Profile snapshots keyed by discord ID and profile name (None for active profile)
+        self.profiles = LRUCache(profile_cache_size, profile_cache_ttl)
+
 
     def create_tables(self):
-        """Create the tables."""
+        """Create the tables, adding any columns missing from tables made by older versions."""
 
         Base.metadata.create_all(self.engine)
 
+        inspector = inspect(self.engine)
+        quote = self.engine.dialect.identifier_preparer.quote
+
+        with self.engine.begin() as connection:
+            for table in Base.metadata.tables.values():
+
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+
+                # Added columns are all nullable, so existing rows need no default
+                for column in table.columns:
+                    if column.name not in existing:
+                        connection.execute(text(
+                            f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                            f"{column.type.compile(self.engine.dialect)}"
+                        ))
+
 
     @session_context
     def fetch_user(self, discord_id, create_missing=True, *, session=None):
-        """Fetch or make user entry with given discord ID."""
+        """Fetch or make user entry with given discord ID.
 
-        user = session.query(User).filter_by(discord_id=discord_id).first()
+        Note:
+            The active profile and the list of profiles are loaded, but not their entries.
+        """
+
+        user = session.query(User).options(
+            joinedload(User.profile),
+            selectinload(User.all_profiles)
+        ).filter_by(discord_id=discord_id).first()
 
         # Make a user entry if not already present and create_missing option is on
         if user is None and create_missing:
@@ -77,24 +162,111 @@ class Database:
 
         # If the profile name is not already in use, create the profile
         if profile_name not in user.all_profiles:
-            return Profile(user=user, name=profile_name, long_name=long_name)
+            profile = Profile(name=profile_name, long_name=long_name, user=user)
+            session.add(profile)
+            mark_stale(session, discord_id, profile_name)
+            return profile
         else:
             return None
         
 
     @session_context
     def fetch_profile(self, discord_id, profile_name=None, *, session=None):
-        """Fetch a player profile."""
+        """Fetch a player profile, with its entries."""
 
-        user = self.fetch_user(discord_id, session=session)
+        query = session.query(Profile).options(joinedload(Profile.entries))
 
         # If no name provided, fetch active profile
         if profile_name is None:
-            profile = user.profile
+            query = query.join(User, User.profile_id == Profile.id)
         else:
-            profile = user.all_profiles.get(profile_name.lower())
+            query = query.join(User, Profile.user_id == User.id).filter(Profile.name == profile_name.lower())
 
-        return profile
+        return query.filter(User.discord_id == discord_id).first()
+
+
+    @session_context
+    def list_profiles(self, discord_id, *, session=None):
+        """List the names of a user's player profiles."""
+
+        return session.scalars(
+            select(Profile.name)
+            .join(User, Profile.user_id == User.id)
+            .where(User.discord_id == discord_id)
+            .order_by(Profile.id)
+        ).all()
+
+
+    def cached_snapshot(self, discord_id, profile_name=None):
+        """Return the cached snapshot of a player profile, or None if not cached."""
+
+        if profile_name is not None:
+            profile_name = profile_name.lower()
+
+        return self.profiles.get((discord_id, profile_name))
+
+
+    @session_context
+    def query_snapshot(self, discord_id, profile_name=None, *, session=None):
+        """Query a snapshot of a player profile (and its entries) in a single query.
+
+        Unlike fetch_profile, this never creates a user.
+        """
+
+        if profile_name is None:
+            profile_join = User.profile_id == Profile.id
+        else:
+            profile_join = (Profile.user_id == User.id) & (Profile.name == profile_name.lower())
+
+        rows = session.execute(
+            select(Profile.name, Profile.long_name, Entry.key, Entry.value)
+            .join(User, profile_join)
+            .outerjoin(Entry, Entry.profile_id == Profile.id)
+            .where(User.discord_id == discord_id)
+        ).all()
+
+        if not rows:
+            return None
+
+        name, long_name, *_ = rows[0]
+        values = {key: value for _, _, key, value in rows if key is not None}
+
+        return ProfileSnapshot(name, long_name, values)
+
+
+    def load_snapshot(self, discord_id, profile_name=None, *, session=None):
+        """Load a snapshot of a player profile from the database, and cache it."""
+
+        if profile_name is not None:
+            profile_name = profile_name.lower()
+
+        generation = self.profiles.generation
+        snapshot = self.query_snapshot(discord_id, profile_name, session=session)
+
+        if snapshot is None:
+            return None
+
+        # A change committed while loading could mean the snapshot is already stale
+        self.profiles.put_if((discord_id, profile_name), snapshot, generation)
+
+        return snapshot
+
+
+    def fetch_snapshot(self, discord_id, profile_name=None):
+        """Fetch a read-only snapshot of a player profile, using the profile cache."""
+
+        snapshot = self.cached_snapshot(discord_id, profile_name)
+
+        if snapshot is None:
+            snapshot = self.load_snapshot(discord_id, profile_name)
+
+        return snapshot
+
+
+    def invalidate_profiles(self, keys):
+        """Drop snapshots from the profile cache."""
+
+        self.profiles.invalidate(keys)
 
 
     @session_context
@@ -107,6 +279,7 @@ class Database:
             return False
         else:
             profile.long_name = new_long_name
+            mark_stale(session, discord_id, profile.name, profile.user.profile is profile)
             return True
 
 
@@ -119,6 +292,7 @@ class Database:
         # If the profile exists, make the switch
         if profile is not None:
             profile.user.profile = profile
+            mark_stale(session, discord_id, profile.name, active=True)
         
         return profile
 
@@ -132,6 +306,7 @@ class Database:
         # If a profile is currently selected, make the update
         if profile is not None:
             profile.entries[key] = Entry(key=key, value=value)
+            mark_stale(session, discord_id, profile.name, profile.user.profile is profile)
         
         return profile
 
@@ -150,39 +325,225 @@ class Database:
         return channel
 
 
+    def set_shards(self, shard_ids, shard_count):
+        """Only cache the fast channels of guilds served by the given gateway shards.
+
+        Args:
+            shard_ids: IDs of the shards served by this process, or None for all.
+            shard_count: Total number of shards.
+
+        Note:
+            Other processes serving the remaining shards share the database, and
+            profiles changed through them would be stale in this process's cache,
+            so the profile cache is disabled when serving a range of shards.
+        """
+
+        self.shard_ids = None if shard_ids is None else frozenset(shard_ids)
+        self.shard_count = shard_count
+        self.fast_channels = None
+
+        if shard_ids is not None:
+            self.profiles = LRUCache(0)
+
+
+    def serves(self, guild_id):
+        """Return whether a guild's channels are served by this process's shards.
+
+        Note:
+            Channels saved before their guild was recorded (guild_id None) are
+            served by every process, as their shard is unknown.
+        """
+
+        return (
+            self.shard_ids is None or
+            guild_id is None or
+            shard_for(guild_id, self.shard_count) in self.shard_ids
+        )
+
+
     @session_context
-    def is_fast(self, channel_id, *, session=None):
-        """Return is_fast flag for specified channel."""
+    def load_fast_channels(self, *, session=None):
+        """Load the discord IDs of all fast channels served by this process into memory."""
+
+        writes = self.fast_writes
+
+        rows = session.query(Channel.discord_id, Channel.guild_id).filter_by(is_fast=True)
+        channels = {discord_id for discord_id, guild_id in rows if self.serves(guild_id)}
+
+        with self.fast_lock:
+            # A toggle committed while loading may be missing from the rows, so keep the current set
+            if (
+                self.fast_channels is None
+                or writes == self.fast_writes
+            ):
+                self.fast_channels = channels
+
+            return self.fast_channels
+
+
+    def refresh_fast_channels(self, interval):
+        """Reload the fast channels every `interval` seconds, on a background thread.
+
+        Picks up channels changed outside this process (e.g. by import-data or
+        load-legacy) without a restart.
+
+        Returns:
+            An Event which stops the refreshing when set.
+        """
+
+        stop = Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.load_fast_channels()
+                except Exception:
+                    # Keep the last loaded set while the database is unavailable
+                    pass
+
+        Thread(target=run, name="fast-channels", daemon=True).start()
 
-        return self.fetch_channel(channel_id, session=session).is_fast
+        return stop
+
+
+    def is_fast(self, channel_id):
+        """Return is_fast flag for specified channel.
+        
+        Note:
+            Answered from memory, so channels are not written to the database
+            just for being read. This is safe because each channel is only ever
+            served by one process, and toggle_fast keeps the cache up to date.
+        """
+
+        if self.fast_channels is None:
+            self.load_fast_channels()
+
+        return channel_id in self.fast_channels
 
     
     @session_context
-    def toggle_fast(self, channel_id, *, session=None):
-        """Toggle the is_fast flag on specified channel."""
+    def toggle_fast(self, channel_id, guild_id=None, *, session=None):
+        """Toggle the is_fast flag on specified channel, recording its guild (if given)."""
 
         channel = self.fetch_channel(channel_id, session=session)
         channel.is_fast = not channel.is_fast
 
+        if guild_id is not None:
+            channel.guild_id = guild_id
+
+        # Write through to the cache once committed
+        mark_fast(session, channel_id, channel.is_fast)
+
         return channel.is_fast
 
 
+    def update_fast_channels(self, flags):
+        """Write committed is_fast flags (by channel ID) through to the fast channel cache."""
+
+        with self.fast_lock:
+
+            self.fast_writes += 1
+
+            if self.fast_channels is None:
+                return
+
+            for channel_id, is_fast in flags.items():
+                if is_fast:
+                    self.fast_channels.add(channel_id)
+                else:
+                    self.fast_channels.discard(channel_id)
+
+
     @session_context
     def fetch_macro(self, discord_id, macro_name, *, session=None):
         """Fetch a saved command."""
 
-        user = self.fetch_user(discord_id, session=session)
-        macro = user.macros.get(macro_name.lower())
+        return session.scalar(
+            select(Macro.command)
+            .join(User, Macro.user_id == User.id)
+            .where(User.discord_id == discord_id, Macro.name == macro_name.lower())
+        )
 
-        if macro is None:
-            return None
-        else:
-            return macro.command
+
+    @session_context
+    def load_macro(self, discord_id, macro_name, *, session=None):
+        """Fetch a saved command, along with its parsed request.
+
+        Returns:
+            The command and request. The request is None if the macro has not been
+            parsed with the current grammar, and the command is None if there is no
+            such macro.
+        """
+
+        row = session.query(Macro.command, Macro.compiled, Macro.grammar_version).join(User).filter(
+            User.discord_id == discord_id,
+            Macro.name == macro_name.lower()
+        ).first()
+
+        if row is None:
+            return None, None
+
+        command, compiled, grammar_version = row
+
+        if (
+            compiled is None
+            or grammar_version != serialise.VERSION
+        ):
+            return command, None
+
+        return command, serialise.loads(compiled)
 
 
     @session_context
-    def save_macro(self, discord_id, macro_name, command, *, session=None):
+    def resolve_macro(self, discord_id, macro_name, *, session=None):
+        """Load a saved command's request, and the profile it rolls against, in one session.
+
+        Returns:
+            The command, request and profile snapshot. The snapshot is None if the
+            request does not need a profile (or it was not found), and the request
+            (and snapshot) are None as for load_macro.
+        """
+
+        command, request = self.load_macro(discord_id, macro_name, session=session)
+
+        if (
+            request is None
+            or not request.is_complex
+        ):
+            return command, request, None
+
+        snapshot = self.cached_snapshot(discord_id, request.profile_name)
+
+        if snapshot is None:
+            snapshot = self.load_snapshot(discord_id, request.profile_name, session=session)
+
+        return command, request, snapshot
+
+
+    @session_context
+    def compile_macro(self, discord_id, macro_name, command, request, *, session=None):
+        """Store the parsed request of a saved command (parsed with the current grammar).
+
+        Args:
+            command: The command which was parsed. Nothing is stored if the macro
+                has since been saved with a different command.
+        """
+
+        user_ids = session.query(User.id).filter_by(discord_id=discord_id).scalar_subquery()
+
+        session.execute(
+            update(Macro)
+            .where(Macro.user_id == user_ids, Macro.name == macro_name.lower(), Macro.command == command)
+            .values(compiled=serialise.dumps(request), grammar_version=serialise.VERSION)
+        )
+
+
+    @session_context
+    def save_macro(self, discord_id, macro_name, command, request=None, *, session=None):
         """Save command for later use.
+
+        Args:
+            request: The parsed command, stored so that it need not be parsed again.
         
         Returns:
             The command previously saved under that macro name (if any).
@@ -191,13 +552,29 @@ class Database:
         # Macro names case insensitive
         macro_name = macro_name.lower()
 
-        user = self.fetch_user(discord_id, session=session)
-        macro = user.macros.get(macro_name)
+        if request is None:
+            compiled = grammar_version = None
+        else:
+            compiled = serialise.dumps(request)
+            grammar_version = serialise.VERSION
+
+        macro = session.query(Macro).join(User, Macro.user_id == User.id).filter(
+            User.discord_id == discord_id,
+            Macro.name == macro_name
+        ).first()
 
         if macro is None:
-            user.macros[macro_name] = Macro(name=macro_name, command=command)
+            user = self.fetch_user(discord_id, session=session)
+            user.macros[macro_name] = Macro(
+                name=macro_name,
+                command=command,
+                compiled=compiled,
+                grammar_version=grammar_version
+            )
             return None
         else:
             old_command = macro.command
             macro.command = command
+            macro.compiled = compiled
+            macro.grammar_version = grammar_version
             return old_command
\ No newline at end of file
@@ -0,0 +1,78 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def sqlite_pragmas(wal=True, synchronous="NORMAL", cache_size=65536, mmap_size=268435456):
+    """Return the PRAGMA statements to run on each new SQLite connection.
+
+    Args:
+        wal: Use write-ahead logging, so readers do not wait for the writer.
+        synchronous: How often SQLite syncs to disk (NORMAL is safe with WAL).
+        cache_size: Page cache size in KiB (None leaves the default).
+        mmap_size: Bytes of the file to memory-map (None leaves the default).
+    """
+
+    pragmas = list()
+
+    if wal:
+        pragmas.append("PRAGMA journal_mode=WAL")
+
+    if synchronous is not None:
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown SQLite synchronous mode \"{synchronous}\".")
+        pragmas.append(f"PRAGMA synchronous={synchronous}")
+
+    # Negative sizes are in KiB rather than pages
+    if cache_size is not None:
+        pragmas.append(f"PRAGMA cache_size=-{int(cache_size)}")
+
+    if mmap_size is not None:
+        pragmas.append(f"PRAGMA mmap_size={int(mmap_size)}")
+
+    return pragmas
+
+
+def make_engine(
+    url,
+    wal=True,
+    synchronous="NORMAL",
+    cache_size=65536,
+    mmap_size=268435456,
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=1800
+):
+    """Create a tuned database engine.
+
+    SQLite engines are given the pragmas from sqlite_pragmas. Other (server) databases
+    are given a connection pool of pool_size connections, plus up to max_overflow
+    extra under load, which are checked before use (pool_pre_ping) and replaced
+    after pool_recycle seconds (-1 to never replace).
+    """
+
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle
+        )
+
+    engine = create_engine(url)
+    pragmas = sqlite_pragmas(wal, synchronous, cache_size, mmap_size)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(connection, connection_record):
+
+        cursor = connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
\ No newline at end of file
@@ -1,7 +1,28 @@
+import json
+from os import path, remove
+from time import perf_counter
 import yaml
+from yaml.composer import Composer
+from yaml.events import MappingStartEvent, MappingEndEvent, SequenceStartEvent, SequenceEndEvent
+from sqlalchemy import select, insert, update
 
+from .models import User, Profile, Entry, Channel
 from ..enums import Key
 
+# Use the LibYAML parser where available
+try:
+    from yaml import CSafeLoader
+except ImportError:
+    StreamLoader = yaml.SafeLoader
+else:
+    class StreamLoader(CSafeLoader, Composer):
+        """LibYAML loader which can compose one node at a time."""
+
+        def __init__(self, stream):
+
+            CSafeLoader.__init__(self, stream)
+            Composer.__init__(self)
+
 
 def deserialise(raw):
     """Deserialise key."""
@@ -13,6 +34,189 @@ def deserialise(raw):
     return Key(raw.lower())
 
 
+def save_channels(session, channel_ids):
+    """Bulk save fast channels in the session."""
+
+    channel_ids = set(channel_ids)
+
+    existing = set(session.scalars(
+        select(Channel.discord_id).where(Channel.discord_id.in_(channel_ids))
+    ))
+
+    if existing:
+        session.execute(
+            update(Channel).where(Channel.discord_id.in_(existing)).values(is_fast=True)
+        )
+
+    new = channel_ids - existing
+    if new:
+        session.execute(insert(Channel), [
+            {"discord_id": channel_id, "is_fast": True} for channel_id in new
+        ])
+
+
+def save_users(session, discord_ids):
+    """Bulk save users in the session, returning a map from discord ID to user ID."""
+
+    query = select(User.discord_id, User.id).where(User.discord_id.in_(set(discord_ids)))
+    users = dict(session.execute(query).all())
+
+    new = set(discord_ids) - set(users)
+    if new:
+        session.execute(insert(User), [{"discord_id": discord_id} for discord_id in new])
+        users = dict(session.execute(query).all())
+
+    return users
+
+
+def save_profiles(session, profiles):
+    """Bulk save profiles in the session, skipping any which already exist.
+
+    Args:
+        session: The session.
+        profiles: Pairs of legacy profile name and profile data.
+
+    Returns:
+        List of (user ID, legacy profile name, profile data, profile ID) for the
+        new profiles, and the number of entries saved.
+    """
+
+    users = save_users(session, [data["Owner"] for _, data in profiles])
+
+    # Avoid overwriting existing profile data
+    existing = set(session.execute(
+        select(Profile.user_id, Profile.name).where(Profile.user_id.in_(users.values()))
+    ).all())
+
+    new = dict()
+    for profile_name, profile_data in profiles:
+        key = users[profile_data["Owner"]], profile_name.lower()
+        if key not in existing and key not in new:
+            new[key] = profile_name, profile_data
+
+    if not new:
+        return [], 0
+
+    session.execute(insert(Profile), [
+        {"user_id": user_id, "name": name, "long_name": profile_name}
+        for (user_id, name), (profile_name, _) in new.items()
+    ])
+
+    profile_ids = {
+        (user_id, name): profile_id for profile_id, user_id, name in session.execute(
+            select(Profile.id, Profile.user_id, Profile.name).where(Profile.user_id.in_(users.values()))
+        )
+    }
+
+    entries = [
+        {"profile_id": profile_ids[key], "key": deserialise(raw), "value": value}
+        for key, (_, profile_data) in new.items()
+        for raw, value in profile_data["Sheet"].items()
+    ]
+    if entries:
+        session.execute(insert(Entry), entries)
+
+    created = [
+        (user_id, profile_name, profile_data, profile_ids[user_id, name])
+        for (user_id, name), (profile_name, profile_data) in new.items()
+    ]
+
+    return created, len(entries)
+
+
+def activate_profiles(session, users):
+    """Bulk switch users without an active profile to their legacy active profile.
+
+    Args:
+        session: The session.
+        users: Pairs of discord ID and legacy user data.
+    """
+
+    names = {
+        discord_id: user_data["Profile"].lower()
+        for discord_id, user_data in users
+        if user_data and user_data.get("Profile")
+    }
+
+    inactive = dict(session.execute(
+        select(User.id, User.discord_id).where(
+            User.discord_id.in_(names),
+            User.profile_id.is_(None)
+        )
+    ).all())
+
+    switches = [
+        {"id": user_id, "profile_id": profile_id}
+        for profile_id, user_id, name in session.execute(
+            select(Profile.id, Profile.user_id, Profile.name).where(Profile.user_id.in_(inactive))
+        )
+        if names[inactive[user_id]] == name
+    ]
+
+    if switches:
+        session.execute(update(User), switches)
+
+
+def reset_caches(database):
+    """Reset caches of a database after writing to it directly."""
+
+    database.fast_channels = None
+    database.profiles.clear()
+
+
+def read_item(loader):
+    """Compose and construct the next node from a YAML loader."""
+
+    value = loader.construct_object(loader.compose_node(None, None), deep=True)
+
+    # Forget the constructed objects, so memory use stays flat
+    loader.constructed_objects = {}
+
+    return value
+
+
+def stream_sections(filename):
+    """Yield (section, item) pairs from a legacy YAML file, reading one item at a time.
+
+    Note:
+        Items of mapping sections are (key, value) pairs.
+    """
+
+    with open(filename, "rb") as db_file:
+
+        loader = StreamLoader(db_file)
+
+        try:
+            # Stream, document, and top-level mapping start events
+            for _ in range(3):
+                loader.get_event()
+
+            while not loader.check_event(MappingEndEvent):
+
+                section = read_item(loader)
+
+                if loader.check_event(SequenceStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(SequenceEndEvent):
+                        yield section, read_item(loader)
+                    loader.get_event()
+
+                elif loader.check_event(MappingStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(MappingEndEvent):
+                        key = read_item(loader)
+                        yield section, (key, read_item(loader))
+                    loader.get_event()
+
+                else:
+                    # Empty section
+                    read_item(loader)
+
+        finally:
+            loader.dispose()
+
+
+
 class YAMLDatabase:
     """Class for loading and converting legacy YAML storage."""
 
@@ -21,40 +225,176 @@ class YAMLDatabase:
         with open(filename) as db_file:
             self.data = yaml.safe_load(db_file)
 
-    
-    def _save_channels(self, database):
-        """Save all channel data to the database."""
 
-        for channel_id in self.data["Fast Channels"]:
-            if not database.is_fast(channel_id):
-                database.toggle_fast(channel_id)
+    def save_all(self, database):
+        """Save all data to the database, in a single transaction.
+
+        Returns:
+            Dictionary of import counts and throughput.
+        """
 
+        start = perf_counter()
 
-    def _save_profiles(self, database):
-        """Save all profile data to the database."""
+        with database.Session.begin() as session:
 
-        for profile_name, profile_data in self.data["Profiles"].items():
+            channels = self.data["Fast Channels"]
+            save_channels(session, channels)
 
-            discord_id = profile_data["Owner"]
-            profile = database.new_profile(discord_id, profile_name)
+            created, entries = save_profiles(session, list(self.data["Profiles"].items()))
 
-            # Avoid overwriting existing profile data
-            if profile is not None:
-                for raw, value in profile_data["Sheet"].items():
-                    key = deserialise(raw)
-                    database.update(discord_id, key, value, profile_name)
-                
-                # If this was active profile, make switch
-                user_data = self.data["Users"].get(discord_id)
+            # If this was active profile, make switch
+            switches = list()
+            for user_id, profile_name, profile_data, profile_id in created:
+                user_data = self.data["Users"].get(profile_data["Owner"])
                 if (
                     user_data is not None and
                     user_data["Profile"] == profile_name
                 ):
-                    database.switch_profile(discord_id, profile_name)
+                    switches.append({"id": user_id, "profile_id": profile_id})
+
+            if switches:
+                session.execute(update(User), switches)
+
+        elapsed = perf_counter() - start
+
+        # Bypassed the Database methods, so reset its caches
+        reset_caches(database)
+
+        return {
+            "channels": len(channels),
+            "profiles": len(created),
+            "entries": entries,
+            "seconds": elapsed,
+            "profiles_per_second": len(created) / elapsed if elapsed else 0.0
+        }
+
+
+
+class YAMLStream:
+    """Class for streaming very large legacy YAML storage into the database.
+
+    Sections are read one item at a time and committed in chunks, so memory use
+    does not grow with the file size. Progress is recorded after each commit, so
+    an interrupted import resumes from the last committed chunk.
+
+    Note:
+        Unlike YAMLDatabase, users are only switched to their legacy active profile
+        if they have no active profile, so that resumed imports stay idempotent.
+    """
+
+    def __init__(self, filename, chunk_size=1000):
+
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.progress_filename = f"{filename}.progress"
+
+
+    def load_progress(self):
+        """Return the number of items already committed from each section."""
+
+        if not path.exists(self.progress_filename):
+            return dict()
+
+        with open(self.progress_filename) as progress_file:
+            return json.load(progress_file)
+
+
+    def save_progress(self, progress):
+
+        with open(self.progress_filename, "w") as progress_file:
+            json.dump(progress, progress_file)
+
+
+    def _save_chunk(self, database, section, items, progress, stats):
+        """Save one chunk of items from a section in its own transaction."""
+
+        with database.Session.begin() as session:
+
+            if section == "Fast Channels":
+                save_channels(session, items)
+                stats["channels"] += len(items)
+
+            elif section == "Profiles":
+                created, entries = save_profiles(session, items)
+                stats["profiles"] += len(created)
+                stats["entries"] += entries
+
+            else:
+                activate_profiles(session, items)
+
+        progress[section] = progress.get(section, 0) + len(items)
+        self.save_progress(progress)
+
+
+    def _import(self, database, sections, progress, stats):
+        """Stream the given sections into the database.
+
+        Returns:
+            True if the Users section came before the Profiles section and was skipped.
+        """
+
+        seen = dict()
+        chunk = list()
+        chunk_section = None
+        deferred = False
+
+        for section, item in stream_sections(self.filename):
+
+            if section not in sections:
+                continue
+
+            # Users can only be switched to profiles which have been imported
+            if (
+                section == "Users"
+                and "Profiles" in sections
+                and "Profiles" not in seen
+            ):
+                deferred = True
+                continue
+
+            # Skip items committed by a previous run
+            seen[section] = seen.get(section, 0) + 1
+            if seen[section] <= progress.get(section, 0):
+                continue
+
+            if chunk and (section != chunk_section or len(chunk) >= self.chunk_size):
+                self._save_chunk(database, chunk_section, chunk, progress, stats)
+                chunk = list()
+
+            chunk_section = section
+            chunk.append(item)
+
+        if chunk:
+            self._save_chunk(database, chunk_section, chunk, progress, stats)
+
+        return deferred
 
 
     def save_all(self, database):
-        """Save all data to the database."""
+        """Stream all data to the database.
+
+        Returns:
+            Dictionary of import counts and throughput (for this run only).
+        """
+
+        start = perf_counter()
+        progress = self.load_progress()
+        stats = {"channels": 0, "profiles": 0, "entries": 0}
+
+        sections = {"Fast Channels", "Profiles", "Users"}
+        if self._import(database, sections, progress, stats):
+            self._import(database, {"Users"}, progress, stats)
+
+        # Finished, so there is nothing to resume
+        if path.exists(self.progress_filename):
+            remove(self.progress_filename)
+
+        elapsed = perf_counter() - start
+
+        # Bypassed the Database methods, so reset its caches
+        reset_caches(database)
+
+        stats["seconds"] = elapsed
+        stats["profiles_per_second"] = stats["profiles"] / elapsed if elapsed else 0.0
 
-        self._save_channels(database)
-        self._save_profiles(database)
\ No newline at end of file
+        return stats
@@ -5,6 +5,7 @@ from sqlalchemy.orm.collections import attribute_mapped_collection
 from ..enums import Key, Attack
 
 
+# Relationships load lazily, and each Database method eagerly loads only what it returns
 Base = declarative_base()
 
 
@@ -15,6 +16,7 @@ class Channel(Base):
 
     id = Column(Integer, primary_key=True)
     discord_id = Column(Integer, unique=True, nullable=False)
+    guild_id = Column(Integer)
     is_fast = Column(Boolean, default=False)
 
 
@@ -31,8 +33,7 @@ class User(Base):
     profile = relationship(
         "Profile",
         uselist=False,
-        foreign_keys=[profile_id],
-        lazy="joined"
+        foreign_keys=[profile_id]
     )
 
 
@@ -46,6 +47,10 @@ class Macro(Base):
     name = Column(String, nullable=False)
     command = Column(String, nullable=False)
 
+    # Parsed command (see fate.parsing.serialise), and the grammar version it was parsed with
+    compiled = Column(String)
+    grammar_version = Column(String)
+
     user_id = Column(Integer, ForeignKey("user.id"))
     user = relationship(
         "User",
@@ -75,8 +80,7 @@ class Profile(Base):
         foreign_keys=[user_id],
         backref=backref(
             "all_profiles",
-            collection_class=attribute_mapped_collection("name"),
-            lazy="joined"
+            collection_class=attribute_mapped_collection("name")
         )
     )
 
@@ -108,7 +112,6 @@ class Entry(Base):
         "Profile",
         backref=backref(
             "entries",
-            collection_class=attribute_mapped_collection("key"),
-            lazy="joined"
+            collection_class=attribute_mapped_collection("key")
         )
     )
\ No newline at end of file
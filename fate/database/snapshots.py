@@ -0,0 +1,19 @@
+class ProfileSnapshot:
+    """Read-only copy of a player profile, detached from any database session.
+
+    Holds only what is needed to perform rolls, so it can be cached cheaply.
+    """
+
+    __slots__ = ("name", "long_name", "values")
+
+    def __init__(self, name, long_name, values):
+
+        self.name = name
+        self.long_name = long_name
+        self.values = values
+
+
+    def get(self, key, default=None):
+        """Get value paired with key."""
+
+        return self.values.get(key, default)
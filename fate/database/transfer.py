@@ -0,0 +1,297 @@
+import csv
+import json
+from itertools import groupby
+from sqlalchemy import select, insert, update, tuple_
+
+from .models import User, Profile, Entry, Channel, Macro
+from .legacy import save_users, reset_caches
+from ..enums import Key
+
+
+# Columns used when records are written as CSV
+FIELDS = ["type", "discord_id", "guild", "user", "profile", "name", "long_name", "key", "value", "command", "is_fast"]
+INTEGER_FIELDS = {"discord_id", "guild", "user", "value"}
+
+# Columns where an empty CSV value means no value (empty text, like a blank long name, is kept)
+OPTIONAL_FIELDS = INTEGER_FIELDS | {"is_fast"}
+
+
+def stream(session, query, batch_size):
+    """Execute a query, fetching rows from the server in batches."""
+
+    return session.execute(query.execution_options(yield_per=batch_size))
+
+
+def export_records(database, batch_size=1000):
+    """Yield every record in the database as a dictionary.
+
+    Records refer to each other by discord ID and name (not database ID), so they
+    can be loaded into a different database. Active profiles come last, once all
+    profiles have been seen.
+    """
+
+    with database.Session() as session:
+
+        query = select(Channel.discord_id, Channel.guild_id, Channel.is_fast)
+        for discord_id, guild_id, is_fast in stream(session, query, batch_size):
+            yield {"type": "channel", "discord_id": discord_id, "guild": guild_id, "is_fast": bool(is_fast)}
+
+        query = select(User.discord_id)
+        for discord_id, in stream(session, query, batch_size):
+            yield {"type": "user", "discord_id": discord_id}
+
+        query = (
+            select(User.discord_id, Profile.name, Profile.long_name)
+            .join(User, Profile.user_id == User.id)
+        )
+        for discord_id, name, long_name in stream(session, query, batch_size):
+            yield {"type": "profile", "user": discord_id, "name": name, "long_name": long_name}
+
+        query = (
+            select(User.discord_id, Profile.name, Entry.key, Entry.value)
+            .join(Profile, Entry.profile_id == Profile.id)
+            .join(User, Profile.user_id == User.id)
+        )
+        for discord_id, name, key, value in stream(session, query, batch_size):
+            yield {"type": "entry", "user": discord_id, "profile": name, "key": key.value, "value": value}
+
+        query = (
+            select(User.discord_id, Macro.name, Macro.command)
+            .join(User, Macro.user_id == User.id)
+        )
+        for discord_id, name, command in stream(session, query, batch_size):
+            yield {"type": "macro", "user": discord_id, "name": name, "command": command}
+
+        query = (
+            select(User.discord_id, Profile.name)
+            .join(Profile, User.profile_id == Profile.id)
+        )
+        for discord_id, name in stream(session, query, batch_size):
+            yield {"type": "active", "user": discord_id, "profile": name}
+
+
+def profile_ids(session, pairs):
+    """Return a map from (discord ID, profile name) to profile ID for existing profiles."""
+
+    return {
+        (discord_id, name): profile_id for profile_id, discord_id, name in session.execute(
+            select(Profile.id, User.discord_id, Profile.name)
+            .join(User, Profile.user_id == User.id)
+            .where(tuple_(User.discord_id, Profile.name).in_(set(pairs)))
+        )
+    }
+
+
+def upsert(session, model, existing, rows, key):
+    """Bulk update rows whose key is in existing (a map to database IDs), and insert the rest."""
+
+    updates = list()
+    inserts = list()
+
+    for row in rows:
+        row_id = existing.get(key(row))
+        if row_id is None:
+            inserts.append(row)
+        else:
+            updates.append({"id": row_id, **row})
+
+    if updates:
+        session.execute(update(model), updates)
+    if inserts:
+        session.execute(insert(model), inserts)
+
+
+def import_channels(session, records):
+
+    existing = dict(session.execute(
+        select(Channel.discord_id, Channel.id)
+        .where(Channel.discord_id.in_({record["discord_id"] for record in records}))
+    ).all())
+
+    rows = [
+        {"discord_id": record["discord_id"], "guild_id": record.get("guild"), "is_fast": record["is_fast"]}
+        for record in records
+    ]
+    upsert(session, Channel, existing, rows, lambda row: row["discord_id"])
+
+
+def import_users(session, records):
+
+    save_users(session, [record["discord_id"] for record in records])
+
+
+def import_profiles(session, records):
+
+    users = save_users(session, [record["user"] for record in records])
+    existing = profile_ids(session, [(record["user"], record["name"]) for record in records])
+
+    rows = [
+        {"user_id": users[record["user"]], "name": record["name"], "long_name": record["long_name"]}
+        for record in records
+    ]
+    discord_ids = {user_id: discord_id for discord_id, user_id in users.items()}
+    upsert(session, Profile, existing, rows, lambda row: (discord_ids[row["user_id"]], row["name"]))
+
+
+def import_entries(session, records):
+
+    profiles = profile_ids(session, [(record["user"], record["profile"]) for record in records])
+    records = [record for record in records if (record["user"], record["profile"]) in profiles]
+
+    existing = {
+        (profile_id, key): entry_id for entry_id, profile_id, key in session.execute(
+            select(Entry.id, Entry.profile_id, Entry.key)
+            .where(Entry.profile_id.in_(set(profiles.values())))
+        )
+    }
+
+    rows = [
+        {
+            "profile_id": profiles[record["user"], record["profile"]],
+            "key": Key(record["key"]),
+            "value": record.get("value")
+        }
+        for record in records
+    ]
+    upsert(session, Entry, existing, rows, lambda row: (row["profile_id"], row["key"]))
+
+
+def import_macros(session, records):
+
+    users = save_users(session, [record["user"] for record in records])
+
+    existing = {
+        (user_id, name): macro_id for macro_id, user_id, name in session.execute(
+            select(Macro.id, Macro.user_id, Macro.name)
+            .where(Macro.user_id.in_(set(users.values())))
+        )
+    }
+
+    # Imported macros are parsed again on first use
+    rows = [
+        {
+            "user_id": users[record["user"]],
+            "name": record["name"],
+            "command": record["command"],
+            "compiled": None,
+            "grammar_version": None
+        }
+        for record in records
+    ]
+    upsert(session, Macro, existing, rows, lambda row: (row["user_id"], row["name"]))
+
+
+def import_active(session, records):
+
+    users = save_users(session, [record["user"] for record in records])
+    profiles = profile_ids(session, [(record["user"], record["profile"]) for record in records])
+
+    switches = [
+        {"id": users[record["user"]], "profile_id": profiles[record["user"], record["profile"]]}
+        for record in records
+        if (record["user"], record["profile"]) in profiles
+    ]
+
+    if switches:
+        session.execute(update(User), switches)
+
+
+IMPORTERS = {
+    "channel": import_channels,
+    "user": import_users,
+    "profile": import_profiles,
+    "entry": import_entries,
+    "macro": import_macros,
+    "active": import_active
+}
+
+
+def batches(records, batch_size):
+    """Group consecutive records of the same type into batches."""
+
+    for kind, group in groupby(records, key=lambda record: record["type"]):
+
+        batch = list()
+
+        for record in group:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield kind, batch
+                batch = list()
+
+        if batch:
+            yield kind, batch
+
+
+def import_records(database, records, batch_size=1000):
+    """Insert or update records (as made by export_records) in batches.
+
+    Returns:
+        The number of records imported.
+    """
+
+    count = 0
+
+    for kind, batch in batches(records, batch_size):
+        with database.Session.begin() as session:
+            IMPORTERS[kind](session, batch)
+        count += len(batch)
+
+    # Bypassed the Database methods, so reset its caches
+    reset_caches(database)
+
+    return count
+
+
+def write_jsonl(records, output_file):
+    """Write records as JSON Lines, returning the number written."""
+
+    count = 0
+
+    for record in records:
+        output_file.write(json.dumps(record) + "\n")
+        count += 1
+
+    return count
+
+
+def read_jsonl(input_file):
+    """Yield records from JSON Lines."""
+
+    for line in input_file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_csv(records, output_file):
+    """Write records as CSV, returning the number written."""
+
+    writer = csv.DictWriter(output_file, FIELDS)
+    writer.writeheader()
+
+    count = 0
+
+    for record in records:
+        writer.writerow(record)
+        count += 1
+
+    return count
+
+
+def read_csv(input_file):
+    """Yield records from CSV."""
+
+    for row in csv.DictReader(input_file):
+
+        record = {
+            field: value for field, value in row.items()
+            if value != "" or field not in OPTIONAL_FIELDS
+        }
+
+        for field in INTEGER_FIELDS & record.keys():
+            record[field] = int(record[field])
+
+        if "is_fast" in record:
+            record["is_fast"] = record["is_fast"] == "True"
+
+        yield record
@@ -1,5 +1,6 @@
 from enum import Enum
-from difflib import get_close_matches
+
+from .fuzzy import FuzzyIndex
 
 
 class GlobalProperty:
@@ -119,9 +120,9 @@ class Key(Enum):
 
         if fuzzy:
             # Try to autocorrect value
-            matches = get_close_matches(value, cls.values, 1)
-            if matches:
-                return cls(*matches)
+            match = cls.index.match(value)
+            if match is not None:
+                return cls(match)
 
         return None
 
@@ -173,6 +174,11 @@ class Key(Enum):
 
 
 
+# Fuzzy lookup index for key values
+Key.index = FuzzyIndex(Key.values)
+
+
+
 class Attack(Enum):
     """Enumeration of possible attack types."""
 
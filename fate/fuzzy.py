@@ -0,0 +1,79 @@
+from collections import Counter
+from difflib import SequenceMatcher
+
+from .cache import LRUCache
+
+
+MISSING = object()
+
+
+class FuzzyIndex:
+    """Precomputed index for autocorrecting words against a fixed list of values.
+
+    Gives the same answers as `difflib.get_close_matches(word, values, 1, cutoff)`,
+    but only compares the word against values which could possibly match, best
+    first, and remembers previous corrections.
+    """
+
+    def __init__(self, values, cutoff=0.6, memo_size=1024):
+
+        self.cutoff = cutoff
+        self.memo = LRUCache(memo_size)
+
+        # Character counts of each value, for bounding the similarity ratio
+        self.entries = [(value, len(value), Counter(value)) for value in values]
+
+
+    def search(self, word):
+        """Return the closest value to word, or None if none are close enough."""
+
+        counts = Counter(word)
+        candidates = list()
+
+        for value, length, value_counts in self.entries:
+
+            # Quick upper bound from lengths (as SequenceMatcher.real_quick_ratio)
+            if 2 * min(len(word), length) / (len(word) + length) < self.cutoff:
+                continue
+
+            # Tighter upper bound from shared characters (as SequenceMatcher.quick_ratio)
+            shared = sum(min(count, value_counts[char]) for char, count in counts.items())
+            bound = 2 * shared / (len(word) + length)
+
+            if bound >= self.cutoff:
+                candidates.append((bound, value))
+
+        best = None
+        best_score = self.cutoff
+
+        # Stop once no remaining candidate can beat (or tie with) the best so far
+        for bound, value in sorted(candidates, reverse=True):
+
+            if bound < best_score:
+                break
+
+            score = SequenceMatcher(None, value, word).ratio()
+
+            # Ties go to the greater value, like get_close_matches
+            if (
+                score > best_score
+                or (
+                    score == best_score
+                    and (best is None or value > best)
+                )
+            ):
+                best, best_score = value, score
+
+        return best
+
+
+    def match(self, word):
+        """Return the closest value to word (memoised)."""
+
+        result = self.memo.get(word, MISSING)
+
+        if result is MISSING:
+            result = self.search(word)
+            self.memo.put(word, result)
+
+        return result
@@ -0,0 +1,198 @@
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter
+
+
+# Upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name: (label, description)
+HISTOGRAMS = {
+    "fate_command_seconds": ("command", "Time to handle a bot command, including the reply."),
+    "fate_send_seconds": ("command", "Time to send a reply to Discord."),
+    "fate_parse_seconds": ("cache", "Time to parse a command."),
+    "fate_db_seconds": ("method", "Time spent in a database method (outermost session only)."),
+}
+
+COUNTERS = {
+    "fate_command_errors_total": ("command", "Number of bot commands which raised an error."),
+}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    def __init__(self):
+
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def observe(self, seconds):
+
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+    def quantile(self, fraction):
+        """Estimate a quantile (as the upper bound of the bucket containing it)."""
+
+        rank = fraction * self.count
+        cumulative = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+        return float("inf")
+
+
+
+class Timer:
+    """Context manager which records its duration in a histogram."""
+
+    def __init__(self, metrics, name, label):
+
+        self.metrics = metrics
+        self.name = name
+        self.label = label
+
+
+    def __enter__(self):
+
+        self.start = perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+
+        self.metrics.observe(self.name, self.label, perf_counter() - self.start)
+
+
+
+class Metrics:
+    """Registry of counters and latency histograms.
+
+    Disabled by default, in which case recording costs a single attribute check.
+    """
+
+    def __init__(self):
+
+        self.enabled = False
+        self.lock = Lock()
+        self.histograms = {name: dict() for name in HISTOGRAMS}
+        self.counters = {name: dict() for name in COUNTERS}
+
+
+    def observe(self, name, label, seconds):
+        """Record a duration in the named histogram."""
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            histogram = self.histograms[name].get(label)
+            if histogram is None:
+                histogram = self.histograms[name][label] = Histogram()
+            histogram.observe(seconds)
+
+
+    def increment(self, name, label):
+        """Increment the named counter."""
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name][label] = self.counters[name].get(label, 0) + 1
+
+
+    def timer(self, name, label):
+        """Return a context manager which times its body into the named histogram."""
+
+        if not self.enabled:
+            return nullcontext()
+
+        return Timer(self, name, label)
+
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+
+        lines = list()
+
+        with self.lock:
+
+            for name, (label, description) in HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+
+                for value, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+            for name, (label, description) in COUNTERS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+
+                for value, count in sorted(self.counters[name].items()):
+                    lines.append(f'{name}{{{label}="{value}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+    def summary(self, name):
+        """Return (label, count, mean, p50, p95) for each label of the named histogram."""
+
+        with self.lock:
+            return [
+                (
+                    value,
+                    histogram.count,
+                    histogram.sum / histogram.count,
+                    histogram.quantile(0.5),
+                    histogram.quantile(0.95)
+                )
+                for value, histogram in sorted(self.histograms[name].items())
+            ]
+
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve the metrics over HTTP (at any path) from a background thread."""
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+
+                body = metrics.render().encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+
+
+# Shared registry
+metrics = Metrics()
@@ -1,23 +1,22 @@
-from random import sample
+from sys import intern
 
+from . import rng
 
-def generator(*args, final):
-    yield from args
-    while True:
-        yield final
 
+# Hit sequences and their text are precomputed up to this many hits
+MAX_HITS = 32
 
-def left_right():
-    return sample(["L", "R"], k=2)
+# Orders of the sides ("A" and "B" below) that arms are hit on
+ORDERS = (("L", "R"), ("R", "L"))
 
-
-TABLE = {
-    "Head": lambda A, B: generator("Head", "Head", f"{A}-Arm", "Body", f"{B}-Arm", final="Body"),
-    "Body": lambda A, B: generator("Body", "Body", f"{A}-Arm", "Head", f"{B}-Arm", final="Body"),
-    "Left Arm": lambda A, B: generator("L-Arm", "L-Arm", "Body", "Head", "Body", final=f"{A}-Arm"),
-    "Right Arm": lambda A, B: generator("R-Arm", "R-Arm", "Body", "Head", "Body", final=f"{A}-Arm"),
-    "Left Leg": lambda A, B: generator("L-Leg", "L-Leg", "Body", f"{A}-Arm", "Head", final="Body"),
-    "Right Leg": lambda A, B: generator("R-Leg", "R-Leg", "Body", f"{A}-Arm", "Head", final="Body")
+# Initial location: (locations of the first hits, location of every later hit)
+PATTERNS = {
+    "Head": (("Head", "Head", "A-Arm", "Body", "B-Arm"), "Body"),
+    "Body": (("Body", "Body", "A-Arm", "Head", "B-Arm"), "Body"),
+    "Left Arm": (("L-Arm", "L-Arm", "Body", "Head", "Body"), "A-Arm"),
+    "Right Arm": (("R-Arm", "R-Arm", "Body", "Head", "Body"), "A-Arm"),
+    "Left Leg": (("L-Leg", "L-Leg", "Body", "A-Arm", "Head"), "Body"),
+    "Right Leg": (("R-Leg", "R-Leg", "Body", "A-Arm", "Head"), "Body")
 }
 
 
@@ -41,16 +40,63 @@ def initial_location(roll):
         return "Left Arm"
 
 
+def sequence(initial, order):
+    """Return the locations of MAX_HITS hits, as a tuple of interned strings."""
+
+    first, final = PATTERNS[initial]
+    A, B = order
+
+    places = [
+        intern(place.replace("A-", f"{A}-").replace("B-", f"{B}-"))
+        for place in first + (final,) * (MAX_HITS - len(first))
+    ]
+
+    return tuple(places)
+
+
+# Initial location of each roll (0 is unused)
+INITIAL = tuple(initial_location(roll) for roll in range(101))
+
+# Hit locations, and their text for each number of hits, by initial location and order
+SEQUENCES = {
+    (initial, order): sequence(initial, ORDERS[order])
+    for initial in PATTERNS
+    for order in range(len(ORDERS))
+}
+TEXTS = {
+    key: tuple(", ".join(f"`{place}`" for place in places[:hits]) for hits in range(MAX_HITS + 1))
+    for key, places in SEQUENCES.items()
+}
+
+
+def draw(roll):
+    """Return the key of the hit sequence for a roll, drawing the order of the arms."""
+
+    return INITIAL[roll], rng.source.roll(2) - 1
+
+
 def locations(roll, hits=None):
     """Return hit locations for a given roll."""
-    
-    initial = initial_location(roll)
 
     if hits is None:
-        return initial
+        return INITIAL[roll]
+
+    places = SEQUENCES[draw(roll)]
+
+    if hits <= MAX_HITS:
+        return places[:hits]
+
+    return places + places[-1:] * (hits - MAX_HITS)
+
+
+def hit_text(roll, hits):
+    """Return the hit locations for a given roll, formatted for Discord."""
+
+    key = draw(roll)
 
-    first, second = left_right()
+    if hits <= MAX_HITS:
+        return TEXTS[key][hits]
 
-    iterator = TABLE[initial](first, second)
+    places = SEQUENCES[key]
 
-    return [next(iterator) for _ in range(hits)]
\ No newline at end of file
+    return TEXTS[key][MAX_HITS] + f", `{places[-1]}`" * (hits - MAX_HITS)
\ No newline at end of file
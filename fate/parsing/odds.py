@@ -0,0 +1,334 @@
+from functools import lru_cache
+from math import comb
+from discord import Color
+
+from .rolls import DiceTerm, BonusTerm
+from ..cache import LRUCache
+
+# NumPy is optional, and is only used to speed up convolution
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Limits on the work of computing exact odds, as convolution cost grows with the square of the span.
+# Spans are summed over dice terms (dice rolled times sides); tearing terms are also summed
+# weighted by their sides, as tearing convolves once per face. Without NumPy, convolution
+# is pure Python and the limits are much lower (both keep the worst case near 50ms).
+MAX_SPAN = 20000
+MAX_TEARING_WORK = 200000
+PYTHON_MAX_SPAN = 1000
+PYTHON_MAX_TEARING_WORK = 20000
+
+# Most probabilities held by cached dice term distributions
+MAX_CACHED_PROBABILITIES = 200000
+
+
+class Distribution:
+    """Exact probability distribution over integer totals.
+
+    Stored as the probability of each total from `offset` upwards.
+    """
+
+    def __init__(self, probabilities, offset=0):
+
+        self.probabilities = tuple(probabilities)
+        self.offset = offset
+
+
+    def __add__(self, other):
+        """Distribution of the sum of two independent totals."""
+
+        offset = self.offset + other.offset
+
+        if numpy is not None:
+            return Distribution(numpy.convolve(self.probabilities, other.probabilities).tolist(), offset)
+
+        result = [0.0] * (len(self.probabilities) + len(other.probabilities) - 1)
+
+        for i, p in enumerate(self.probabilities):
+            if p:
+                for j, q in enumerate(other.probabilities):
+                    result[i + j] += p * q
+
+        return Distribution(result, offset)
+
+
+    def __neg__(self):
+
+        return Distribution(reversed(self.probabilities), -self.maximum)
+
+
+    def shift(self, amount):
+        """Distribution of the total plus a constant."""
+
+        return Distribution(self.probabilities, self.offset + amount)
+
+
+    @property
+    def minimum(self):
+        return self.offset
+
+
+    @property
+    def maximum(self):
+        return self.offset + len(self.probabilities) - 1
+
+
+    @property
+    def mean(self):
+        return sum((self.offset + i) * p for i, p in enumerate(self.probabilities))
+
+
+    def at_least(self, total):
+        """Probability that the total is at least the given value."""
+
+        start = max(0, total - self.offset)
+
+        return sum(self.probabilities[start:])
+
+
+    def percentile(self, percent):
+        """Smallest total reached or beaten with given percentage probability."""
+
+        cumulative = 0.0
+
+        for i, p in enumerate(self.probabilities):
+            cumulative += p
+            if cumulative >= percent / 100 - 1e-12:
+                return self.offset + i
+
+        return self.maximum
+
+
+
+CONSTANT = Distribution([1.0])
+
+
+def power(distribution, n):
+    """Distribution of the sum of n independent copies of a distribution."""
+
+    result = CONSTANT
+
+    # Exponentiation by squaring
+    while n:
+        if n & 1:
+            result = result + distribution
+        n >>= 1
+        if n:
+            distribution = distribution + distribution
+
+    return result
+
+
+def uniform(low, high, sides):
+    """Distribution of one fair die with given sides, restricted to faces low to high."""
+
+    return Distribution([1 / sides] * (high - low + 1), low)
+
+
+# Dice term distributions, bounded by their total size as users choose the terms
+DISTRIBUTIONS = LRUCache(MAX_CACHED_PROBABILITIES, weigh=lambda distribution: len(distribution.probabilities))
+
+
+def dice_distribution(number, sides, tearing):
+    """Distribution of the total of a (positive) dice term, using the cache."""
+
+    key = number, sides, tearing
+    result = DISTRIBUTIONS.get(key)
+
+    if result is None:
+        result = compute_dice_distribution(number, sides, tearing)
+        DISTRIBUTIONS.put(key, result)
+
+    return result
+
+
+def compute_dice_distribution(number, sides, tearing):
+    """Distribution of the total of a (positive) dice term.
+
+    Note:
+        Tearing rolls number + 1 dice and drops the lowest. Conditioning on the lowest
+        die being m, the kept total is the sum of all dice minus m, and
+        P(lowest = m, sum = s) = P(all >= m, sum = s) - P(all >= m + 1, sum = s).
+    """
+
+    if not tearing:
+        return power(uniform(1, sides, sides), number)
+
+    # Kept totals run from number to number * sides
+    probabilities = [0.0] * (number * (sides - 1) + 1)
+    above = None
+
+    for lowest in range(sides, 0, -1):
+        at_least = power(uniform(lowest, sides, sides), number + 1)
+
+        for i, p in enumerate(at_least.probabilities):
+            total = at_least.offset + i
+            if above is not None and total >= above.offset:
+                p -= above.probabilities[total - above.offset]
+
+            kept = total - lowest - number
+            if 0 <= kept < len(probabilities):
+                probabilities[kept] += p
+
+        above = at_least
+
+    # Clear rounding error from the subtraction
+    return Distribution([max(p, 0.0) for p in probabilities], number)
+
+
+@lru_cache(maxsize=256)
+def crit_chance(number, sides, tearing):
+    """Probability that a dice term rolls a critical (see DiceTerm.is_crit)."""
+
+    if sides == 10:
+        confirm = 1.0
+    elif sides == 5:
+        confirm = 0.5
+    else:
+        return 0.0
+
+    face = 1 / sides
+
+    if not tearing:
+        return 1 - (1 - face * confirm) ** number
+
+    # Condition on the number of crit faces rolled; one is only dropped if every die shows it
+    no_crit = sum(
+        comb(number + 1, count) * face ** count * (1 - face) ** (number + 1 - count) * (1 - confirm) ** count
+        for count in range(number + 1)
+    )
+    no_crit += face ** (number + 1) * (1 - confirm) ** number
+
+    return 1 - no_crit
+
+
+def term_text(term):
+    """Short text for a dice equation term."""
+
+    if isinstance(term, DiceTerm):
+        return f"{term.number}d{term.sides}{'T' if term.tearing else ''}"
+    else:
+        return f"{term.stat.name}B"
+
+
+def equation_text(equation):
+    """Short text for a dice equation."""
+
+    text = ""
+
+    for term in equation.terms:
+        if text:
+            text += " + " if term.sign == 1 else " - "
+        elif term.sign == -1:
+            text += "-"
+        text += term_text(term)
+
+    if equation.flat != 0 or not text:
+        if text:
+            text += f" {'+' if equation.flat >= 0 else '-'} {abs(equation.flat)}"
+        else:
+            text = str(equation.flat)
+
+    return text
+
+
+def distribution(equation, profile=None):
+    """Exact distribution of a single repetition of a dice equation."""
+
+    result = CONSTANT.shift(equation.flat)
+
+    for term in equation.terms:
+        if isinstance(term, BonusTerm):
+            value, *_ = term.roll(profile)
+            result = result.shift(value)
+        else:
+            dice = dice_distribution(term.number, term.sides, term.tearing)
+            result = result + (dice if term.sign == 1 else -dice)
+
+    return result
+
+
+def crit_probability(equation):
+    """Probability that a single repetition of a dice equation is critical."""
+
+    no_crit = 1.0
+
+    for term in equation.terms:
+        if isinstance(term, DiceTerm):
+            no_crit *= 1 - crit_chance(term.number, term.sides, term.tearing)
+
+    return 1 - no_crit
+
+
+def too_large(equation):
+    """Return whether the exact odds of a dice equation would take too long to compute."""
+
+    if numpy is None:
+        max_span, max_tearing_work = PYTHON_MAX_SPAN, PYTHON_MAX_TEARING_WORK
+    else:
+        max_span, max_tearing_work = MAX_SPAN, MAX_TEARING_WORK
+
+    span = 0
+    tearing_work = 0
+
+    for term in equation.terms:
+        if isinstance(term, DiceTerm):
+            term_span = (term.number + term.tearing) * term.sides
+            span += term_span
+            if term.tearing:
+                tearing_work += term_span * term.sides
+
+    return (
+        span > max_span
+        or tearing_work > max_tearing_work
+    )
+
+
+def odds(equation, profile=None, target=None):
+    """Generate response describing the odds of a dice equation.
+
+    Args:
+        equation: The DiceEquation.
+        profile: Player profile, needed for stat bonus terms.
+        target: Optional total to give the chance of reaching.
+    """
+
+    if (
+        equation.is_complex
+        and profile is None
+    ):
+        return None
+
+    if too_large(equation):
+        return "Too many dice to work out exact odds."
+
+    result = distribution(equation, profile)
+
+    description = (
+        f"Rolls: `{equation_text(equation)}`\n"
+        f"Mean: `{result.mean:.2f}` | Range: `{result.minimum}` to `{result.maximum}`\n"
+        "Percentiles: " + " | ".join(
+            f"{percent}%: `{result.percentile(percent)}`" for percent in PERCENTILES
+        )
+    )
+
+    if target is not None:
+        description += f"\nChance of `{target}` or more: `{result.at_least(target):.1%}`"
+
+    description += f"\nCritical: `{crit_probability(equation):.1%}`"
+
+    response = {
+        "description": description,
+        "color": Color.light_gray(),
+        "footer": "Odds"
+    }
+
+    if profile is not None:
+        response["profile"] = profile.long_name
+
+    return response
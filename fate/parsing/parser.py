@@ -1,9 +1,35 @@
+from os import path
+from time import perf_counter
+from re import compile as compile_regex, IGNORECASE
 from lark import Lark
 from lark.visitors import Transformer
 from lark.exceptions import LarkError
 
 from .rolls import SkillTest, DiceTerm, BonusTerm, DiceEquation
 from ..enums import Key, Attack
+from ..cache import LRUCache
+from ..metrics import metrics
+
+
+# Compiled LALR tables, tagged with a hash of the grammar and options by Lark
+COMPILED_GRAMMAR = path.join(path.dirname(__file__), "fate.lark.cache")
+
+# Dice (e.g. "3d10") and stat bonus (e.g. "SB") terms never appear in a valid skill test
+DICE_TERM = compile_regex(
+    r"(?<![#=\w])(\d*d\d|(%s)b(?!\w))" % "|".join(key.name for key in Key if key.is_stat),
+    IGNORECASE
+)
+
+
+def normalise(raw):
+    """Return the cache key for input string raw.
+
+    Surrounding whitespace is stripped and case is folded; neither changes the
+    meaning of a command (profile and macro names are case-insensitive). Inner
+    whitespace is kept, as the grammar only allows single spaces within names.
+    """
+
+    return raw.strip().lower()
 
 
 class Processor(Transformer):
@@ -94,8 +120,7 @@ class Processor(Transformer):
         sign = -1 if sign == "-" else 1
 
         if isinstance(value, DiceTerm):
-            value.sign *= sign
-            return value
+            return value if sign == 1 else value.negated()
         elif isinstance(value, Key):
             return BonusTerm(value, sign)
         else:
@@ -138,18 +163,44 @@ class Processor(Transformer):
 
 
 
+def load_grammar(compiled=COMPILED_GRAMMAR):
+    """Return a Lark parser for the FateBot grammar.
+
+    Args:
+        compiled: Path of the compiled grammar file, or None to always compile.
+
+    Notes:
+        - The compiled tables are only loaded if their hash matches the current
+          grammar, otherwise the grammar is compiled and the file rewritten.
+        - If the file cannot be written (e.g. read-only install), the grammar is
+          compiled in memory instead.
+    """
+
+    options = dict(
+        start=["test_start", "dice_start"],
+        parser="lalr",
+        maybe_placeholders=True,
+        transformer=Processor()
+    )
+
+    if compiled is not None:
+        try:
+            return Lark.open("fate.lark", __file__, cache=compiled, **options)
+        except OSError:
+            pass
+
+    return Lark.open("fate.lark", __file__, **options)
+
+
+
 class Parser:
     """Parsing class for the FateBot grammar."""
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, cache_size=256, compiled=COMPILED_GRAMMAR):
 
         self.debug = debug
-        self.parser = Lark.open("fate.lark", __file__,
-            start=["test_start", "dice_start"],
-            parser="lalr",
-            maybe_placeholders=True,
-            transformer=Processor()
-        )
+        self.cache = LRUCache(cache_size)
+        self.parser = load_grammar(compiled)
 
     
     def _parse(self, raw, start):
@@ -162,11 +213,55 @@ class Parser:
             return None
 
     
-    def parse(self, raw):
-        """Parse input string raw."""
+    def _dispatch(self, raw):
+        """Parse input string raw, trying the start rule it most likely matches first.
+
+        Anything containing a dice or stat bonus term cannot be a skill test, so
+        it goes straight to the dice rule. The other rule is only tried if the
+        first one fails, so the result is the same as trying both in turn.
+        """
+
+        if DICE_TERM.search(raw):
+            first, second = "dice_start", "test_start"
+        else:
+            first, second = "test_start", "dice_start"
 
         return (
-            self._parse(raw, "test_start") or
-            self._parse(raw, "dice_start")
+            self._parse(raw, first) or
+            self._parse(raw, second)
         )
 
+
+    def parse(self, raw):
+        """Parse input string raw.
+
+        Successful parses are cached on the normalised input, so the returned
+        requests are shared and must not be modified. Failed parses are not
+        cached, to stop ordinary chat in fast channels flushing the cache.
+        """
+
+        if not metrics.enabled:
+            return self._cached_parse(raw)[0]
+
+        start = perf_counter()
+        request, cached = self._cached_parse(raw)
+        metrics.observe("fate_parse_seconds", "hit" if cached else "miss", perf_counter() - start)
+
+        return request
+
+
+    def _cached_parse(self, raw):
+        """Parse input string raw through the cache, returning the request and whether it was cached."""
+
+        key = normalise(raw)
+        request = self.cache.get(key)
+
+        if request is not None:
+            return request, True
+
+        request = self._dispatch(raw)
+        if request is not None:
+            self.cache.put(key, request)
+
+        return request, False
+
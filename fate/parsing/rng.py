@@ -0,0 +1,143 @@
+from math import prod
+from os import urandom
+from random import Random
+
+# NumPy is optional, and is only used to draw dice in batches
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MODES = ("fast", "crypto", "seeded")
+
+# Bytes below the limit for a die map evenly onto its faces; the rest are redrawn
+LIMITS = [0] + [256 - 256 % sides for sides in range(1, 257)]
+
+
+class RandomSource:
+    """Source of dice rolls, drawn from a buffer of random bytes.
+
+    Bytes are drawn in blocks from `randbytes` and mapped onto die faces by
+    rejection, so every face is equally likely.
+
+    Note:
+        Not thread-safe; rolls are only made on the event loop thread.
+    """
+
+    def __init__(self, randbytes, block_size=4096):
+
+        self.randbytes = randbytes
+        self.block_size = block_size
+        self.buffer = b""
+        self.index = 0
+
+
+    def bytes(self, count):
+        """Return the next count random bytes."""
+
+        if count > len(self.buffer) - self.index:
+            self.buffer = self.randbytes(max(count, self.block_size))
+            self.index = 0
+
+        chunk = self.buffer[self.index:self.index + count]
+        self.index += count
+
+        return chunk
+
+
+    def roll(self, sides):
+        """Return roll of a fair die with given sides."""
+
+        if sides < 1:
+            raise ValueError(f"Die must have at least one side, not {sides}.")
+
+        if sides > 256:
+            return self._roll_wide(sides)
+
+        limit = LIMITS[sides]
+
+        while True:
+            if self.index >= len(self.buffer):
+                self.buffer = self.randbytes(self.block_size)
+                self.index = 0
+
+            byte = self.buffer[self.index]
+            self.index += 1
+
+            if byte < limit:
+                return byte % sides + 1
+
+
+    def _roll_wide(self, sides):
+        """Roll a die with more than 256 sides, using as many bytes as needed."""
+
+        width = (sides.bit_length() + 7) // 8
+        span = 256 ** width
+        limit = span - span % sides
+
+        while True:
+            value = int.from_bytes(self.bytes(width), "big")
+            if value < limit:
+                return value % sides + 1
+
+
+    def rolls(self, sides, count):
+        """Return count rolls of a fair die with given sides."""
+
+        return [self.roll(sides) for _ in range(count)]
+
+
+    def array(self, sides, shape):
+        """Return a NumPy array of rolls of a fair die with given sides."""
+
+        size = prod(shape) if isinstance(shape, tuple) else shape
+
+        if sides > 256 or sides < 1:
+            return numpy.array(self.rolls(sides, size), dtype=numpy.int64).reshape(shape)
+
+        limit = LIMITS[sides]
+        batches = list()
+        kept = 0
+
+        while kept < size:
+            # Draw enough bytes that rejections rarely need another pass
+            raw = numpy.frombuffer(self.bytes((size - kept) * 256 // limit + 16), dtype=numpy.uint8)
+            batches.append(raw[raw < limit])
+            kept += len(batches[-1])
+
+        rolls = batches[0] if len(batches) == 1 else numpy.concatenate(batches)
+
+        return (rolls[:size].astype(numpy.int64) % sides + 1).reshape(shape)
+
+
+
+def make_source(mode="fast", seed=None):
+    """Create a random source.
+
+    Args:
+        mode: "fast" (pseudo-random), "crypto" (from the operating system's
+            cryptographic generator), or "seeded" (deterministic, for tests and
+            benchmarks).
+        seed: Seed for seeded mode.
+    """
+
+    if mode == "fast":
+        return RandomSource(Random().randbytes)
+    elif mode == "crypto":
+        return RandomSource(urandom)
+    elif mode == "seeded":
+        return RandomSource(Random(seed).randbytes)
+    else:
+        raise ValueError(f"Unknown random source mode \"{mode}\".")
+
+
+# Source used by every roll
+source = make_source()
+
+
+def use(new_source):
+    """Make all rolls draw from a new source."""
+
+    global source
+    source = new_source
\ No newline at end of file
@@ -1,21 +1,36 @@
-from random import randint
 from math import ceil, floor
 from discord import Color
 
 from ..enums import Attack, Key
-from .locations import locations
+from . import rng
+from .locations import locations, hit_text
+
+# NumPy is optional, and is only used to roll dice equations in batches
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Fewest random draws for which rolling a batch with NumPy beats rolling one at a time
+BATCH_THRESHOLD = 32
 
 
 def d(N):
     """Return roll of a fair N-sided die."""
 
-    return randint(1, N)
+    return rng.source.roll(N)
 
 
 def test(target):
     """Perform test with given target, returning raw roll and degrees of success."""
 
-    roll = randint(1, 100)
+    roll = rng.source.roll(100)
+
+    return roll, degrees_of_success(target, roll)
+
+
+def calculate_degrees(target, roll):
+    """Calculate degrees of success (negative for failure) of a roll against target."""
 
     difference = target - roll
 
@@ -32,7 +47,27 @@ def test(target):
         elif roll == 1:
             degrees = 1
 
-    return roll, degrees
+    return degrees
+
+
+# Degrees of success are looked up for targets in this range, and calculated outside it
+MIN_TARGET = -100
+MAX_TARGET = 200
+
+# Degrees of success by target (offset by MIN_TARGET) and roll (0 is unused)
+DEGREES = tuple(
+    tuple(calculate_degrees(target, roll) for roll in range(101))
+    for target in range(MIN_TARGET, MAX_TARGET + 1)
+)
+
+
+def degrees_of_success(target, roll):
+    """Return degrees of success (negative for failure) of a roll against target."""
+
+    if MIN_TARGET <= target <= MAX_TARGET:
+        return DEGREES[target - MIN_TARGET][roll]
+
+    return calculate_degrees(target, roll)
 
 
 def make_hint(stat, skill, attack):
@@ -87,7 +122,7 @@ def hit_description(roll, degrees, attack):
     else:
         return f"Hit: `{locations(roll)}`"
     
-    return f"Hits: `{hits}` = " + ", ".join(f"`{place}`" for place in locations(roll, hits))
+    return f"Hits: `{hits}` = {hit_text(roll, hits)}"
 
 
 def describe_one(roll, degrees, attack, pad):
@@ -145,8 +180,62 @@ def colour(rolls):
 
 
 
-class SkillTest:
+class Value:
+    """Base class for slotted, immutable value types.
+
+    Requests are cached and shared between concurrent commands, so they cannot be
+    changed once made. Values are equal if they are of the same type and all of
+    their attributes are equal.
+    """
+
+    __slots__ = ()
+
+    def _assign(self, **attributes):
+        """Set attributes (only for use while initialising)."""
+
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+
+    def _fields(self):
+
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+    def __setattr__(self, name, value):
+
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+    def __delattr__(self, name):
+
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+    def __eq__(self, other):
+
+        if type(other) is not type(self):
+            return NotImplemented
+
+        return self._fields() == other._fields()
+
+
+    def __hash__(self):
+
+        return hash((type(self), self._fields()))
+
+
+    def __repr__(self):
+
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+
+class SkillTest(Value):
     """Class for representing Dark Heresy roll requests."""
+
+    __slots__ = ("modifier", "stat", "skill", "attack", "repeats", "hint", "is_complex", "profile_name")
     
     def __init__(self, modifier=0, stat=None, skill=None, attack=None, repeats=1, profile_name=None):
         """Create a roll request.
@@ -163,14 +252,16 @@ class SkillTest:
             - If no stat or skill is provided, do simple test using modifier as target.
         """
 
-        self.modifier = modifier
-        self.stat = stat
-        self.skill = skill
-        self.attack = attack
-        self.repeats = repeats
-        self.hint = make_hint(stat, skill, attack)
-        self.is_complex = bool(skill or stat)
-        self.profile_name = profile_name
+        self._assign(
+            modifier=modifier,
+            stat=stat,
+            skill=skill,
+            attack=attack,
+            repeats=repeats,
+            hint=make_hint(stat, skill, attack),
+            is_complex=bool(skill or stat),
+            profile_name=profile_name
+        )
 
 
     def get_target(self, profile):
@@ -221,22 +312,49 @@ class SkillTest:
 
 
 
-class DiceTerm:
+class DiceTerm(Value):
     """Class for representing a dice term in a dice equation."""
 
+    __slots__ = ("number", "sides", "tearing", "sign")
+
     def __init__(self, number, sides, tearing, sign=1):
 
-        self.number = number
-        self.sides = sides
-        self.tearing = tearing
-        self.sign = sign
+        self._assign(number=number, sides=sides, tearing=tearing, sign=sign)
+
+
+    def negated(self):
+        """Return this term with the opposite sign."""
+
+        return DiceTerm(self.number, self.sides, self.tearing, -self.sign)
 
     
-    def roll(self, profile=None):
+    def is_crit(self, roll):
+        """Check whether a single die roll is critical."""
+
+        return (
+            self.sides == roll == 10
+            or (
+                self.sides == roll == 5
+                and rng.source.roll(2) == 2
+            )
+        )
 
-        total = 0
-        descriptions = list()
-        crit = False
+
+    def result(self, rolls, dropped, crits):
+        """Total and describe kept rolls, the dropped roll (if tearing) and their crit flags."""
+
+        description = ", ".join(
+            f"{roll}!" if crit else str(roll) for roll, crit in zip(rolls, crits)
+        )
+        total = sum(rolls) * self.sign
+
+        if dropped is not None:
+            description += f" / drop {dropped}"
+
+        return total, self.sign,  f"[{description}] ({self.number}d{self.sides}{'T' if self.tearing else ''})", any(crits)
+
+
+    def roll(self, profile=None):
 
         rolls = [d(self.sides) for _ in range(self.number)]
         dropped = None
@@ -245,40 +363,55 @@ class DiceTerm:
             rolls.append(d(self.sides))
             dropped = min(rolls)
             rolls.remove(dropped)
-        
-        for roll in rolls:
-            total += roll
-
-            # Check for critical rolls
-            if (
-                self.sides == roll == 10
-                or (
-                    self.sides == roll == 5
-                    and randint(1, 2) == 2
-                )
-            ):
-                crit = True
-                descriptions.append(f"{roll}!")
-            else:
-                descriptions.append(str(roll))
 
-        description = ", ".join(descriptions)
-        total *= self.sign
+        return self.result(rolls, dropped, [self.is_crit(roll) for roll in rolls])
 
-        if dropped is not None:
-            description += f" / drop {dropped}"
 
-        return total, self.sign,  f"[{description}] ({self.number}d{self.sides}{'T' if self.tearing else ''})", crit
+    def roll_many(self, profile, repeats):
+        """Perform repeated rolls, drawing all of the dice at once for large enough batches."""
+
+        count = self.number + self.tearing
+
+        if (
+            numpy is None
+            or count * repeats < BATCH_THRESHOLD
+        ):
+            return [self.roll(profile) for _ in range(repeats)]
+
+        rows = numpy.arange(repeats)
+        rolls = rng.source.array(self.sides, (repeats, count))
+        dropped = [None] * repeats
+
+        # Drop the (first) lowest die of each repeat
+        if self.tearing:
+            lowest = rolls.argmin(axis=1)
+            dropped = rolls[rows, lowest].tolist()
+
+            keep = numpy.ones(rolls.shape, dtype=bool)
+            keep[rows, lowest] = False
+            rolls = rolls[keep].reshape(repeats, self.number)
+
+        if self.sides == 10:
+            crits = rolls == 10
+        elif self.sides == 5:
+            crits = (rolls == 5) & (rng.source.array(2, rolls.shape) == 2)
+        else:
+            crits = numpy.zeros(rolls.shape, dtype=bool)
+
+        return [
+            self.result(*args) for args in zip(rolls.tolist(), dropped, crits.tolist())
+        ]
 
 
 
-class BonusTerm:
+class BonusTerm(Value):
     """Class for representing a stat bonus term in a dice equation."""
 
+    __slots__ = ("stat", "sign")
+
     def __init__(self, stat, sign):
 
-        self.stat = stat
-        self.sign = sign
+        self._assign(stat=stat, sign=sign)
 
 
     def roll(self, profile):
@@ -289,29 +422,43 @@ class BonusTerm:
         return total, self.sign, f"{total} ({self.stat.name}B)", False
 
 
+    def roll_many(self, profile, repeats):
+
+        return [self.roll(profile)] * repeats
+
+
 
-class DiceEquation:
+class DiceEquation(Value):
     """Class for representing dice equations."""
 
+    __slots__ = ("terms", "flat", "dice_count", "repeats", "is_complex", "profile_name")
+
     def __init__(self, terms, repeats=1):
         """Create a dice equation."""
 
-        self.flat = 0
-        self.terms = list()
-        self.dice_count = 0
-        self.repeats = repeats
-        self.is_complex = False
-        self.profile_name = None
+        flat = 0
+        dice_count = 0
+        is_complex = False
+        rolled = list()
 
         for term in terms:
             if isinstance(term, int):
-                self.flat += term
+                flat += term
             elif isinstance(term, DiceTerm):
-                self.terms.append(term)
-                self.dice_count += term.number
+                rolled.append(term)
+                dice_count += term.number
             else:
-                self.terms.append(term)
-                self.is_complex = True
+                rolled.append(term)
+                is_complex = True
+
+        self._assign(
+            terms=tuple(rolled),
+            flat=flat,
+            dice_count=dice_count,
+            repeats=repeats,
+            is_complex=is_complex,
+            profile_name=None
+        )
 
 
     def roll_once(self, profile=None):
@@ -323,13 +470,32 @@ class DiceEquation:
         ):
             return None
 
+        return self.combine([term.roll(profile) for term in self.terms])
+
+
+    def roll_many(self, profile=None):
+        """Perform every repetition of this roll request, rolling each term in one batch."""
+
+        if (
+            self.is_complex
+            and profile is None
+        ):
+            return None
+
+        columns = [term.roll_many(profile, self.repeats) for term in self.terms]
+        rows = zip(*columns) if columns else [()] * self.repeats
+
+        return [self.combine(results) for results in rows]
+
+
+    def combine(self, results):
+        """Combine the results of rolling each term once."""
+
         total = self.flat
         description = "" 
         critical = False
 
-        for term in self.terms:
-            
-            value, sign, text, crit = term.roll(profile)
+        for value, sign, text, crit in results:
 
             total += value
             critical |= crit
@@ -350,7 +516,10 @@ class DiceEquation:
     def __call__(self, profile=None):
         """Perform and format roll."""
 
-        rolls = [self.roll_once(profile) for _ in range(self.repeats)]
+        rolls = self.roll_many(profile)
+
+        if rolls is None:
+            return None
 
         description = "\n".join(
             f"Rolls: `{description}` | Total: `{total}`" for _, description, total in rolls
@@ -0,0 +1,78 @@
+import json
+from hashlib import sha256
+from os import path
+
+from .rolls import SkillTest, DiceTerm, BonusTerm, DiceEquation
+from ..enums import Key, Attack
+
+# Bump whenever the encoding, or the way the parser builds requests, changes
+FORMAT = 1
+
+with open(path.join(path.dirname(__file__), "fate.lark"), "rb") as grammar_file:
+    GRAMMAR = grammar_file.read()
+
+# Version tag stored with compiled macros; any mismatch means they must be parsed again
+VERSION = f"{FORMAT}:{sha256(GRAMMAR).hexdigest()[:16]}"
+
+
+def name(member):
+    """Name of an enum member, or None."""
+
+    return None if member is None else member.name
+
+
+def encode_term(term):
+
+    if isinstance(term, DiceTerm):
+        return ["d", term.number, term.sides, term.tearing, term.sign]
+    else:
+        return ["b", term.stat.name, term.sign]
+
+
+def decode_term(data):
+
+    if data[0] == "d":
+        _, number, sides, tearing, sign = data
+        return DiceTerm(number, sides, tearing, sign)
+    else:
+        _, stat, sign = data
+        return BonusTerm(Key[stat], sign)
+
+
+def dumps(request):
+    """Encode a parsed request (SkillTest or DiceEquation) as compact JSON."""
+
+    if isinstance(request, SkillTest):
+        data = [
+            "t",
+            request.modifier,
+            name(request.stat),
+            name(request.skill),
+            name(request.attack),
+            request.repeats,
+            request.profile_name
+        ]
+    else:
+        data = ["e", request.repeats, request.flat, [encode_term(term) for term in request.terms]]
+
+    return json.dumps(data, separators=(",", ":"))
+
+
+def loads(raw):
+    """Decode a request encoded by dumps."""
+
+    kind, *data = json.loads(raw)
+
+    if kind == "t":
+        modifier, stat, skill, attack, repeats, profile_name = data
+        return SkillTest(
+            modifier,
+            None if stat is None else Key[stat],
+            None if skill is None else Key[skill],
+            None if attack is None else Attack[attack],
+            repeats,
+            profile_name
+        )
+    else:
+        repeats, flat, terms = data
+        return DiceEquation([decode_term(term) for term in terms] + [flat], repeats)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import json
+import marshal
+import pstats
+from contextlib import nullcontext
+from contextvars import ContextVar
+from cProfile import Profile
+from os import makedirs, path
+from random import random
+from threading import Lock, Thread
+from time import monotonic, perf_counter
+
+
+# Phase timings of the command being sampled in the current task (if any)
+current_sample = ContextVar("current_sample", default=None)
+
+
+class Sampling:
+    """Context manager which profiles one command invocation."""
+
+    def __init__(self, profiler, command):
+
+        self.profiler = profiler
+        self.command = command
+        self.phases = dict()
+
+
+    def __enter__(self):
+
+        self.profiler.active = True
+        self.token = current_sample.set(self.phases)
+        self.start = perf_counter()
+        self.profile = Profile()
+        self.profile.enable()
+
+        return self
+
+
+    def __exit__(self, *exc_info):
+
+        self.profile.disable()
+        elapsed = perf_counter() - self.start
+        current_sample.reset(self.token)
+        self.profiler.active = False
+
+        self.profiler.record(self.command, self.profile, self.phases, elapsed)
+
+
+
+class Phase:
+    """Context manager which adds its duration to a phase of the sampled command."""
+
+    def __init__(self, phases, name):
+
+        self.phases = phases
+        self.name = name
+
+
+    def __enter__(self):
+
+        self.start = perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + perf_counter() - self.start
+
+
+
+class Profiler:
+    """Samples a fraction of command invocations with cProfile.
+
+    Stats are aggregated per command and periodically dumped to a directory, as
+    one `<command>.prof` file each (for pstats or snakeviz), plus `phases.json`
+    with the wall time spent parsing, rolling, in the database and rendering.
+
+    Notes:
+        Only one command is profiled at a time. cProfile sees the event loop thread
+        only, so database queries (run on the thread pool) appear in the phase
+        timings but not the .prof files, while other commands which run during a
+        sampled command's awaits may appear in its .prof file.
+    """
+
+    def __init__(self):
+
+        self.rate = 0.0
+        self.directory = "profiles"
+        self.interval = 60.0
+        self.active = False
+        self.lock = Lock()
+        self.dump_lock = Lock()
+        self.stats = dict()
+        self.phases = dict()
+        self.last_dump = monotonic()
+
+
+    def configure(self, rate, directory="profiles", interval=60.0):
+        """Start sampling the given fraction (0 to 1) of commands."""
+
+        self.rate = rate
+        self.directory = directory
+        self.interval = interval
+        self.last_dump = monotonic()
+
+
+    def command(self, name):
+        """Return a context manager which profiles the named command, if sampled."""
+
+        if (
+            not self.rate
+            or self.active
+            or random() >= self.rate
+        ):
+            return nullcontext()
+
+        return Sampling(self, name)
+
+
+    def phase(self, name):
+        """Return a context manager which times a phase of the sampled command (if any)."""
+
+        phases = current_sample.get()
+
+        if phases is None:
+            return nullcontext()
+
+        return Phase(phases, name)
+
+
+    def record(self, command, profile, phases, elapsed):
+        """Add a sampled invocation to the aggregate stats, dumping them if due."""
+
+        with self.lock:
+
+            if command in self.stats:
+                self.stats[command].add(profile)
+            else:
+                self.stats[command] = pstats.Stats(profile)
+
+            totals = self.phases.setdefault(command, {"samples": 0, "total": 0.0, "phases": dict()})
+            totals["samples"] += 1
+            totals["total"] += elapsed
+            for phase, seconds in phases.items():
+                totals["phases"][phase] = totals["phases"].get(phase, 0.0) + seconds
+
+            due = monotonic() - self.last_dump >= self.interval
+            if due:
+                self.last_dump = monotonic()
+
+        # Write on a thread, so the sampled command does not stall the event loop
+        if due:
+            Thread(target=self.dump, name="profile-dump", daemon=True).start()
+
+
+    def dump(self):
+        """Write the aggregate stats to the profile directory."""
+
+        # Copy the stats under the lock, and write them outside it so recording is not held up
+        with self.lock:
+            self.last_dump = monotonic()
+            stats = {command: dict(command_stats.stats) for command, command_stats in self.stats.items()}
+            phases = json.dumps(self.phases, indent=2)
+
+        if not stats:
+            return
+
+        with self.dump_lock:
+
+            makedirs(self.directory, exist_ok=True)
+
+            # The format written by pstats.Stats.dump_stats
+            for command, command_stats in stats.items():
+                with open(path.join(self.directory, f"{command}.prof"), "wb") as stats_file:
+                    marshal.dump(command_stats, stats_file)
+
+            with open(path.join(self.directory, "phases.json"), "w") as phases_file:
+                phases_file.write(phases)
+
+
+
+# Shared profiler
+profiler = Profiler()
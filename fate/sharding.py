@@ -0,0 +1,55 @@
+def shard_for(guild_id, shard_count):
+    """Return the ID of the gateway shard which serves a guild (as Discord assigns them).
+
+    Direct messages (guild_id None) are always served by shard 0.
+    """
+
+    if guild_id is None:
+        return 0
+
+    return (guild_id >> 22) % shard_count
+
+
+def parse_shard_count(value):
+    """Parse a shard count: a number, or "auto" (or nothing) to ask Discord for one."""
+
+    if value is None or value == "" or value == "auto":
+        return None
+
+    count = int(value)
+    if count < 1:
+        raise ValueError(f"Shard count must be at least 1, not {count}.")
+
+    return count
+
+
+def parse_shard_ids(value):
+    """Parse shard IDs, given as ranges and single IDs (e.g. "0-3,8").
+
+    Returns:
+        Sorted list of shard IDs, or None if no IDs are given.
+    """
+
+    if value is None or value.strip() == "":
+        return None
+
+    shard_ids = set()
+
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        shard_ids.update(range(int(first), int(last or first) + 1))
+
+    return sorted(shard_ids)
+
+
+def check_shards(shard_ids, shard_count):
+    """Raise ValueError unless the shard IDs can be run with the shard count."""
+
+    if shard_ids is None:
+        return
+
+    if shard_count is None:
+        raise ValueError("A shard count is needed to run a range of shards.")
+
+    if not shard_ids or shard_ids[0] < 0 or shard_ids[-1] >= shard_count:
+        raise ValueError(f"Shard IDs must be between 0 and {shard_count - 1}.")
\ No newline at end of file
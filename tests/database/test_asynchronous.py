@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import pytest
+
+from fate.database import Database, AsyncDatabase
+
+
+class TestAsyncDatabase:
+
+    @pytest.fixture
+    def db(self, tmp_path):
+
+        # File database, so that every worker thread sees the same data
+        db = Database(f"sqlite:///{tmp_path / 'fate.db'}")
+        db.create_tables()
+
+        async_db = AsyncDatabase(db)
+        yield async_db
+        async_db.close()
+
+
+    def test_methods(self, db):
+
+        async def run():
+            profile = await db.new_profile(100, "Bob")
+            assert profile.name == "bob"
+
+            profiles = await asyncio.gather(*(db.fetch_profile(100, "bob") for _ in range(10)))
+            assert all(profile.long_name == "Bob" for profile in profiles)
+
+            assert await db.is_fast(5) is False
+            assert await db.toggle_fast(5) is True
+            assert await db.is_fast(5) is True
+
+        asyncio.run(run())
+
+
+    def test_off_loop(self, db):
+
+        async def run():
+            return await db.run(threading.current_thread)
+
+        assert asyncio.run(run()) is not threading.main_thread()
@@ -1,6 +1,28 @@
+from contextlib import contextmanager
+from time import sleep
 import pytest
+from sqlalchemy import create_engine, event, text
 
 from fate.database.database import Database
+from fate.database.models import Channel
+from fate.parsing import Parser, serialise
+from fate.enums import Key
+
+
+@contextmanager
+def record_queries(db):
+    """Record the SQL statements executed by a database."""
+
+    statements = list()
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
 
 
 class TestDatabase:
@@ -29,3 +51,236 @@ class TestDatabase:
         assert db.fetch_user(137, create_missing=False) is None
         assert db.fetch_user(137) is not None
         assert db.fetch_user(137, create_missing=False) is not None
+
+
+    def test_fast_channels(self, db):
+
+        assert db.is_fast(5) is False
+        assert db.toggle_fast(5) is True
+        assert db.is_fast(5) is True
+        assert db.toggle_fast(6) is True
+        assert db.toggle_fast(6) is False
+        assert db.is_fast(6) is False
+
+        # Reading a channel does not create a row
+        assert db.is_fast(7) is False
+        with db.Session() as session:
+            assert session.query(Channel).count() == 2
+
+        # Flags are preloaded in bulk from the database
+        db.fast_channels = None
+        assert db.load_fast_channels() == {5}
+
+        # The cache is only written once the change is committed
+        def fail(session):
+            raise RuntimeError
+
+        event.listen(db.Session, "before_commit", fail)
+        with pytest.raises(RuntimeError):
+            db.toggle_fast(8)
+        event.remove(db.Session, "before_commit", fail)
+
+        assert db.is_fast(8) is False
+        assert db.toggle_fast(8) is True
+        assert db.is_fast(8) is True
+
+
+    def test_refresh_fast_channels(self, tmp_path):
+
+        url = f"sqlite:///{tmp_path / 'fate.db'}"
+        bot, importer = Database(url), Database(url)
+        bot.create_tables()
+        assert bot.load_fast_channels() == set()
+
+        # Channels changed by another process are picked up without a restart
+        stop = bot.refresh_fast_channels(0.01)
+        importer.toggle_fast(9)
+
+        for _ in range(200):
+            if bot.is_fast(9):
+                break
+            sleep(0.01)
+
+        stop.set()
+        assert bot.is_fast(9)
+
+
+    def test_reload_race(self, db):
+
+        db.load_fast_channels()
+
+        # A toggle committed while the channels are being reloaded is not lost
+        toggled = list()
+
+        def toggle(*args):
+            if not toggled:
+                toggled.append(True)
+                db.toggle_fast(10)
+
+        event.listen(db.engine, "after_cursor_execute", toggle)
+        db.load_fast_channels()
+        event.remove(db.engine, "after_cursor_execute", toggle)
+
+        assert db.is_fast(10)
+
+
+    def test_profile_cache(self, db):
+
+        assert db.fetch_snapshot(100) is None
+
+        db.new_profile(100, "Bob", "Bobby")
+        db.new_profile(100, "Alice")
+        db.switch_profile(100, "bob")
+        db.update(100, Key.AG, 45)
+
+        snapshot = db.fetch_snapshot(100)
+        assert snapshot.name == "bob"
+        assert snapshot.get(Key.AG) == 45
+        assert snapshot.get(Key.BS, 30) == 30
+        assert db.fetch_snapshot(100) is snapshot
+        assert db.fetch_snapshot(100, "BOB") is db.fetch_snapshot(100, "bob")
+
+        # Changes to another profile leave the active profile cached
+        alice = db.fetch_snapshot(100, "alice")
+        db.update(100, Key.AG, 20, "alice")
+        assert db.fetch_snapshot(100) is snapshot
+        assert db.fetch_snapshot(100, "alice") is not alice
+
+        # Changes to the active profile are seen straight away
+        db.update(100, Key.AG, 50)
+        assert db.fetch_snapshot(100).get(Key.AG) == 50
+
+        db.rename_profile(100, "bob", "Robert")
+        assert db.fetch_snapshot(100).long_name == "Robert"
+        assert db.fetch_snapshot(100, "bob").long_name == "Robert"
+
+        db.switch_profile(100, "alice")
+        assert db.fetch_snapshot(100).name == "alice"
+
+        assert db.profiles.hits > 0
+
+
+    def test_macros(self, db, monkeypatch):
+
+        parser = Parser()
+
+        # Macros saved without a request are parsed on first use
+        assert db.load_macro(100, "gun") == (None, None)
+        db.save_macro(100, "gun", "bs !!")
+        assert db.load_macro(100, "Gun") == ("bs !!", None)
+
+        request = parser.parse("bs !!")
+        db.compile_macro(100, "GUN", "bs !!", request)
+        command, loaded = db.load_macro(100, "gun")
+        assert command == "bs !!"
+        assert serialise.dumps(loaded) == serialise.dumps(request)
+
+        # Saving a new command replaces the request
+        db.save_macro(100, "gun", "2d10 + 5", parser.parse("2d10 + 5"))
+        assert db.load_macro(100, "gun")[1].flat == 5
+        assert db.fetch_macro(100, "gun") == "2d10 + 5"
+
+        # Requests parsed with another grammar are ignored
+        monkeypatch.setattr(serialise, "VERSION", "0:old")
+        assert db.load_macro(100, "gun") == ("2d10 + 5", None)
+
+
+    def test_compile_race(self, db):
+
+        parser = Parser()
+        db.save_macro(100, "gun", "bs !!")
+
+        # A macro is loaded for parsing...
+        command, request = db.load_macro(100, "gun")
+        assert request is None
+
+        # ...but is saved again before it is compiled
+        db.save_macro(100, "gun", "2d10 + 5", parser.parse("2d10 + 5"))
+        db.compile_macro(100, "gun", command, parser.parse(command))
+
+        # The new command's request is kept
+        assert db.load_macro(100, "gun")[1] == parser.parse("2d10 + 5")
+
+
+    def test_upgrade_tables(self, tmp_path):
+
+        url = f"sqlite:///{tmp_path / 'fate.db'}"
+
+        # Macro table as made before macros were stored parsed
+        with create_engine(url).begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE macro (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+                "command VARCHAR NOT NULL, user_id INTEGER)"
+            ))
+
+        db = Database(url)
+        db.create_tables()
+        db.save_macro(100, "gun", "bs !!")
+
+        assert db.load_macro(100, "gun") == ("bs !!", None)
+
+
+    def test_resolve_macro(self, db):
+
+        parser = Parser()
+
+        db.new_profile(100, "bob")
+        db.switch_profile(100, "bob")
+        db.update(100, Key.BS, 45)
+        db.new_profile(100, "alice")
+        db.save_macro(100, "gun", "bs !!", parser.parse("bs !!"))
+        db.save_macro(100, "alice", "#alice 2d10 + 5", parser.parse("#alice 2d10 + 5"))
+        db.save_macro(100, "pistol", "#alice bs !", parser.parse("#alice bs !"))
+
+        # Macro and profile are loaded with two queries, and nothing is written
+        with record_queries(db) as statements:
+            command, request, profile = db.resolve_macro(100, "gun")
+
+        assert command == "bs !!"
+        assert request.stat is Key.BS
+        assert profile.name == "bob"
+        assert profile.get(Key.BS) == 45
+        assert len(statements) == 2
+        assert all(statement.lstrip().startswith("SELECT") for statement in statements)
+
+        # The profile is cached
+        with record_queries(db) as statements:
+            assert db.resolve_macro(100, "gun")[2] is profile
+        assert len(statements) == 1
+
+        assert db.resolve_macro(100, "pistol")[2].name == "alice"
+        assert db.resolve_macro(100, "alice")[2] is None
+        assert db.resolve_macro(100, "missing") == (None, None, None)
+        assert db.resolve_macro(200, "gun") == (None, None, None)
+        assert db.fetch_user(200, create_missing=False) is None
+
+
+    def test_query_counts(self, db):
+
+        db.new_profile(100, "bob")
+        db.new_profile(100, "alice")
+        db.switch_profile(100, "bob")
+        for key in Key:
+            db.update(100, key, 40)
+            db.update(100, key, 30, "alice")
+        db.save_macro(100, "gun", "bs !!")
+
+        # Profile lists and users are loaded without any entries
+        with record_queries(db) as statements:
+            assert db.list_profiles(100) == ["bob", "alice"]
+            user = db.fetch_user(100)
+        assert len(statements) == 3
+        assert not any("entry" in statement for statement in statements)
+        assert user.profile.name == "bob"
+        assert set(user.all_profiles) == {"bob", "alice"}
+
+        # One profile's entries are loaded in a single query
+        with record_queries(db) as statements:
+            profile = db.fetch_profile(100, "alice")
+        assert len(statements) == 1
+        assert profile.get(Key.AG) == 30
+
+        with record_queries(db) as statements:
+            assert db.fetch_snapshot(100).get(Key.AG) == 40
+            assert db.fetch_macro(100, "gun") == "bs !!"
+        assert len(statements) == 2
\ No newline at end of file
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import text
+
+import fate.database.engine
+from fate.database.engine import make_engine, sqlite_pragmas
+
+
+def pragma(engine, name):
+
+    with engine.connect() as connection:
+        return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+class TestEngine:
+
+    def test_sqlite(self, tmp_path):
+
+        engine = make_engine(f"sqlite:///{tmp_path / 'fate.db'}", cache_size=1024, mmap_size=4096)
+
+        assert pragma(engine, "journal_mode") == "wal"
+        assert pragma(engine, "synchronous") == 1
+        assert pragma(engine, "cache_size") == -1024
+        assert pragma(engine, "mmap_size") == 4096
+
+
+    def test_sqlite_defaults(self, tmp_path):
+
+        engine = make_engine(
+            f"sqlite:///{tmp_path / 'fate.db'}",
+            wal=False,
+            synchronous=None,
+            cache_size=None,
+            mmap_size=None
+        )
+
+        assert pragma(engine, "journal_mode") == "delete"
+        assert pragma(engine, "synchronous") == 2
+
+
+    def test_pragmas(self):
+
+        assert sqlite_pragmas(False, "full", None, None) == ["PRAGMA synchronous=FULL"]
+
+        with pytest.raises(ValueError):
+            sqlite_pragmas(synchronous="sometimes")
+
+
+    def test_server(self, monkeypatch):
+
+        calls = list()
+        monkeypatch.setattr(fate.database.engine, "create_engine", lambda url, **kwargs: calls.append((url, kwargs)))
+
+        make_engine("postgresql://fate@localhost/fate", pool_size=8, pool_recycle=-1)
+
+        assert calls == [(
+            "postgresql://fate@localhost/fate",
+            {"pool_size": 8, "max_overflow": 10, "pool_pre_ping": True, "pool_recycle": -1}
+        )]
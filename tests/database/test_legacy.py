@@ -0,0 +1,165 @@
+import yaml
+import pytest
+
+from fate.database.database import Database
+from fate.database import legacy as legacy_module
+from fate.database.legacy import YAMLDatabase, YAMLStream, stream_sections
+from fate.enums import Key
+
+
+LEGACY = """
+Fast Channels: [11, 12]
+Users:
+  100: {Profile: Bob}
+  200: {Profile: Missing}
+Profiles:
+  Bob:
+    Owner: 100
+    Sheet: {Agility: 45, Tech-Use: 30}
+  Alice:
+    Owner: 100
+    Sheet: {Strength: 35}
+  Carl:
+    Owner: 200
+    Sheet: {}
+"""
+
+
+class TestYAMLDatabase:
+
+    @pytest.fixture
+    def db(self):
+
+        db = Database("sqlite://")
+        db.create_tables()
+
+        return db
+
+
+    @pytest.fixture
+    def legacy(self, tmp_path):
+
+        filename = tmp_path / "legacy.yaml"
+        filename.write_text(LEGACY)
+
+        return YAMLDatabase(filename)
+
+
+    def test_save_all(self, db, legacy):
+
+        # Existing data is kept
+        db.new_profile(200, "carl", "Carl the First")
+        db.toggle_fast(12)
+        db.toggle_fast(12)
+
+        stats = legacy.save_all(db)
+        assert stats["channels"] == 2
+        assert stats["profiles"] == 2
+        assert stats["entries"] == 3
+
+        assert db.is_fast(11) and db.is_fast(12)
+
+        bob = db.fetch_profile(100)
+        assert bob.name == "bob"
+        assert bob.long_name == "Bob"
+        assert bob.get(Key.AG) == 45
+        assert bob.get(Key.TECH_USE) == 30
+        assert db.fetch_profile(100, "alice").get(Key.S) == 35
+
+        assert db.fetch_profile(200) is None
+        assert db.fetch_profile(200, "carl").long_name == "Carl the First"
+
+        # Importing again changes nothing
+        stats = legacy.save_all(db)
+        assert stats["profiles"] == 0
+        assert stats["entries"] == 0
+        assert set(db.fetch_user(100).all_profiles) == {"bob", "alice"}
+
+
+
+class TestYAMLStream:
+
+    @pytest.fixture
+    def db(self):
+
+        db = Database("sqlite://")
+        db.create_tables()
+
+        return db
+
+
+    def check(self, db):
+
+        assert db.is_fast(11) and db.is_fast(12)
+
+        bob = db.fetch_profile(100)
+        assert bob.name == "bob"
+        assert bob.get(Key.AG) == 45
+        assert bob.get(Key.TECH_USE) == 30
+        assert db.fetch_profile(100, "alice").get(Key.S) == 35
+        assert db.fetch_profile(200, "carl") is not None
+        assert db.fetch_profile(200) is None
+
+
+    @pytest.mark.parametrize("loader", ["default", "python"])
+    def test_stream_sections(self, tmp_path, monkeypatch, loader):
+
+        if loader == "python":
+            monkeypatch.setattr(legacy_module, "StreamLoader", yaml.SafeLoader)
+
+        filename = tmp_path / "legacy.yaml"
+        filename.write_text(LEGACY + "Empty:\n")
+
+        data = yaml.safe_load(LEGACY)
+        expected = [("Fast Channels", channel) for channel in data["Fast Channels"]]
+        for section in ("Users", "Profiles"):
+            expected.extend((section, item) for item in data[section].items())
+
+        assert list(stream_sections(filename)) == expected
+
+
+    @pytest.mark.parametrize("text", [
+        LEGACY,
+        # Users section before the profiles it refers to
+        LEGACY.replace("Users:", "Later:").replace("Profiles:", "Users:\n  100: {Profile: Bob}\nProfiles:")
+    ])
+    def test_save_all(self, db, tmp_path, text):
+
+        filename = tmp_path / "legacy.yaml"
+        filename.write_text(text)
+
+        stats = YAMLStream(filename, chunk_size=1).save_all(db)
+        assert stats["channels"] == 2
+        assert stats["profiles"] == 3
+        assert stats["entries"] == 3
+        self.check(db)
+
+
+    def test_resume(self, db, tmp_path, monkeypatch):
+
+        filename = tmp_path / "legacy.yaml"
+        filename.write_text(LEGACY)
+        stream = YAMLStream(filename, chunk_size=1)
+
+        # Fail on the second profile
+        calls = []
+        save_profiles = legacy_module.save_profiles
+        def failing(session, profiles):
+            calls.append(profiles)
+            if len(calls) == 2:
+                raise RuntimeError
+            return save_profiles(session, profiles)
+
+        monkeypatch.setattr(legacy_module, "save_profiles", failing)
+        with pytest.raises(RuntimeError):
+            stream.save_all(db)
+
+        assert stream.load_progress() == {"Fast Channels": 2, "Profiles": 1}
+
+        # Resume from the failed chunk
+        monkeypatch.setattr(legacy_module, "save_profiles", save_profiles)
+        stats = stream.save_all(db)
+        assert stats["channels"] == 0
+        assert stats["profiles"] == 2
+        assert stream.load_progress() == {}
+        self.check(db)
@@ -0,0 +1,99 @@
+import io
+import pytest
+
+from fate.database.database import Database
+from fate.database import transfer
+from fate.enums import Key
+
+
+def make_database():
+
+    db = Database("sqlite://")
+    db.create_tables()
+
+    return db
+
+
+class TestTransfer:
+
+    @pytest.fixture
+    def db(self):
+
+        db = make_database()
+
+        db.new_profile(100, "Bob", "Bobby")
+        db.new_profile(100, "Alice")
+        db.switch_profile(100, "alice")
+        db.update(100, Key.AG, 45, "bob")
+        db.update(100, Key.AG, 50, "bob")
+        db.update(100, Key.S, None, "bob")
+        db.save_macro(100, "gun", "bs !!")
+        db.save_macro(200, "dodge", "dodge + 10")
+        db.toggle_fast(11, 700)
+        db.toggle_fast(12)
+        db.toggle_fast(12)
+
+        return db
+
+
+    def check(self, db):
+
+        assert db.is_fast(11)
+        assert not db.is_fast(12)
+
+        with db.Session() as session:
+            assert db.fetch_channel(11, session=session).guild_id == 700
+            assert db.fetch_channel(12, session=session).guild_id is None
+
+        assert db.fetch_profile(100).name == "alice"
+        bob = db.fetch_profile(100, "bob")
+        assert bob.long_name == "Bobby"
+        assert bob.get(Key.AG) == 50
+        assert bob.get(Key.S, 30) is None
+
+        assert db.fetch_macro(100, "gun") == "bs !!"
+        assert db.fetch_macro(200, "dodge") == "dodge + 10"
+        assert db.fetch_user(200, create_missing=False).profile is None
+
+
+    @pytest.mark.parametrize("format", ["jsonl", "csv"])
+    def test_round_trip(self, db, format):
+
+        write = getattr(transfer, f"write_{format}")
+        read = getattr(transfer, f"read_{format}")
+
+        output_file = io.StringIO()
+        count = write(transfer.export_records(db, batch_size=2), output_file)
+
+        # 2 channels, 2 users, 2 profiles, 2 entries, 2 macros, 1 active profile
+        assert count == 11
+
+        other = make_database()
+        output_file.seek(0)
+        assert transfer.import_records(other, read(output_file), batch_size=3) == 11
+        self.check(other)
+
+        # Importing again updates in place
+        other.update(100, Key.AG, 20, "bob")
+        other.rename_profile(100, "bob", "Robert")
+        output_file.seek(0)
+        transfer.import_records(other, read(output_file))
+        self.check(other)
+        assert set(other.fetch_user(100).all_profiles) == {"bob", "alice"}
+
+
+    @pytest.mark.parametrize("format", ["jsonl", "csv"])
+    def test_empty_text(self, format):
+
+        db = make_database()
+        db.new_profile(100, "bob")
+        db.rename_profile(100, "bob", "")
+
+        output_file = io.StringIO()
+        getattr(transfer, f"write_{format}")(transfer.export_records(db), output_file)
+
+        other = make_database()
+        output_file.seek(0)
+        transfer.import_records(other, getattr(transfer, f"read_{format}")(output_file))
+
+        assert other.fetch_profile(100, "bob").long_name == ""
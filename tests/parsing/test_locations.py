@@ -0,0 +1,63 @@
+import pytest
+from sys import intern
+
+from fate.parsing import rng, locations
+from fate.parsing.locations import initial_location, hit_text, INITIAL, SEQUENCES, MAX_HITS
+
+
+def reference_locations(roll, hits, A, B):
+    """Hit locations as generated before they were precomputed."""
+
+    def generator(*args, final):
+        yield from args
+        while True:
+            yield final
+
+    table = {
+        "Head": lambda: generator("Head", "Head", f"{A}-Arm", "Body", f"{B}-Arm", final="Body"),
+        "Body": lambda: generator("Body", "Body", f"{A}-Arm", "Head", f"{B}-Arm", final="Body"),
+        "Left Arm": lambda: generator("L-Arm", "L-Arm", "Body", "Head", "Body", final=f"{A}-Arm"),
+        "Right Arm": lambda: generator("R-Arm", "R-Arm", "Body", "Head", "Body", final=f"{A}-Arm"),
+        "Left Leg": lambda: generator("L-Leg", "L-Leg", "Body", f"{A}-Arm", "Head", final="Body"),
+        "Right Leg": lambda: generator("R-Leg", "R-Leg", "Body", f"{A}-Arm", "Head", final="Body")
+    }
+
+    iterator = table[initial_location(roll)]()
+
+    return [next(iterator) for _ in range(hits)]
+
+
+class Fixed:
+    """Random source which always rolls the same value."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def roll(self, sides):
+        return self.value
+
+
+class TestLocations:
+
+    @pytest.mark.parametrize(["value", "order"], [(1, ("L", "R")), (2, ("R", "L"))])
+    def test_equivalence(self, value, order, monkeypatch):
+
+        monkeypatch.setattr(rng, "source", Fixed(value))
+
+        for roll in range(1, 101):
+            assert locations.locations(roll) == initial_location(roll)
+
+            for hits in range(1, MAX_HITS + 10):
+                expected = reference_locations(roll, hits, *order)
+                assert list(locations.locations(roll, hits)) == expected
+                assert hit_text(roll, hits) == ", ".join(f"`{place}`" for place in expected)
+
+
+    def test_shared(self):
+
+        # Sequences are slices of shared tuples of interned strings
+        assert len(INITIAL) == 101
+        places = locations.locations(45, 3)
+        shared = [SEQUENCES["Body", order] for order in range(2)]
+        assert any(all(a is b for a, b in zip(places, sequence)) for sequence in shared)
+        assert all(place is intern(place) for place in places)
@@ -0,0 +1,137 @@
+from itertools import product
+import pytest
+
+from fate.parsing import odds
+from fate.parsing.odds import dice_distribution, crit_chance, distribution, crit_probability
+from fate.parsing.parser import Parser
+from fate.enums import Key
+
+
+def brute_force(number, sides, tearing):
+    """Enumerate every roll of a dice term, returning its distribution and crit chance."""
+
+    totals = dict()
+    crit = 0.0
+    confirm = {10: 1.0, 5: 0.5}.get(sides, 0.0)
+    weight = 1 / sides ** (number + tearing)
+
+    for rolls in product(range(1, sides + 1), repeat=number + tearing):
+        rolls = list(rolls)
+        if tearing:
+            rolls.remove(min(rolls))
+
+        total = sum(rolls)
+        totals[total] = totals.get(total, 0.0) + weight
+        crit += weight * (1 - (1 - confirm) ** rolls.count(sides))
+
+    return totals, crit
+
+
+class Profile:
+
+    long_name = "Bob"
+
+    def get(self, key, default=None):
+        return {Key.S: 42}.get(key, default)
+
+
+
+class TestOdds:
+
+    @pytest.fixture(params=["numpy", "python"])
+    def engine(self, request, monkeypatch):
+
+        if request.param == "python":
+            monkeypatch.setattr(odds, "numpy", None)
+
+        odds.DISTRIBUTIONS.clear()
+        yield
+        odds.DISTRIBUTIONS.clear()
+
+
+    @pytest.mark.parametrize(["number", "sides", "tearing"], [
+        (1, 10, False),
+        (3, 10, False),
+        (0, 10, True),
+        (1, 10, True),
+        (3, 10, True),
+        (2, 5, False),
+        (3, 5, True),
+        (2, 6, True),
+    ])
+    def test_dice_term(self, engine, number, sides, tearing):
+
+        expected, crit = brute_force(number, sides, tearing)
+        result = dice_distribution(number, sides, tearing)
+
+        assert result.minimum == min(expected)
+        assert result.maximum == max(expected)
+        for total, probability in expected.items():
+            assert result.probabilities[total - result.offset] == pytest.approx(probability)
+
+        assert crit_chance(number, sides, tearing) == pytest.approx(crit)
+
+
+    def test_equation(self, engine):
+
+        equation = Parser().parse("2d10 - 1d5 + SB - 3")
+        result = distribution(equation, Profile())
+
+        assert result.minimum == 2 - 5 + 4 - 3
+        assert result.maximum == 20 - 1 + 4 - 3
+        assert result.mean == pytest.approx(11 - 3 + 4 - 3)
+        assert result.at_least(result.minimum) == pytest.approx(1)
+        assert result.at_least(result.maximum) == pytest.approx(1 / 500)
+        assert result.percentile(50) == 9
+
+        assert crit_probability(equation) == pytest.approx(1 - 0.81 * 0.9)
+
+
+    def test_response(self):
+
+        equation = Parser().parse("2d10T + SB")
+
+        assert odds.odds(equation) is None
+
+        response = odds.odds(equation, Profile(), 15)
+        assert response["profile"] == "Bob"
+        assert "Rolls: `2d10T + SB`" in response["description"]
+        assert "Chance of `15` or more" in response["description"]
+
+
+    def test_too_large(self, monkeypatch):
+
+        parser = Parser()
+
+        assert not odds.too_large(parser.parse("1d10000 + 100d100"))
+        assert not odds.too_large(parser.parse("10d100T"))
+
+        # Pure Python convolution is much slower
+        monkeypatch.setattr(odds, "numpy", None)
+        assert odds.too_large(parser.parse("1d10000 + 100d100"))
+        assert odds.too_large(parser.parse("10d100T"))
+        assert not odds.too_large(parser.parse("10d100"))
+        assert not odds.too_large(parser.parse("3d10T + 2d100"))
+        monkeypatch.undo()
+
+        for command in ("3d100000", "200d100000", "10d1000 + 11d1000", "30d100T"):
+            equation = parser.parse(command)
+            assert odds.too_large(equation)
+            assert odds.odds(equation) == "Too many dice to work out exact odds."
+
+
+    def test_cache_size(self, monkeypatch):
+
+        monkeypatch.setattr(odds, "DISTRIBUTIONS", odds.LRUCache(100, weigh=lambda d: len(d.probabilities)))
+
+        # Cached distributions are bounded by their total size, not their number
+        dice_distribution(3, 10, False)
+        dice_distribution(2, 10, False)
+        assert odds.DISTRIBUTIONS.weight == 47
+        dice_distribution(6, 10, False)
+        assert list(odds.DISTRIBUTIONS.data) == [(2, 10, False), (6, 10, False)]
+        assert odds.DISTRIBUTIONS.weight == 74
+
+        # Distributions larger than the whole cache are not kept
+        dice_distribution(2, 100, False)
+        assert (2, 100, False) not in odds.DISTRIBUTIONS
@@ -1,6 +1,7 @@
 import pytest
 
 from fate.parsing.parser import Parser
+from fate.parsing.rolls import SkillTest, DiceEquation
 from fate.enums import Key, Attack
 
 
@@ -71,4 +72,58 @@ class TestParser:
             assert result == expected
         else:
             for key, value in expected.items():
-                assert getattr(result, key) == value
\ No newline at end of file
+                assert getattr(result, key) == value
+
+
+    def test_cache(self, parser):
+
+        first = parser.parse("athletics on agility +20")
+        second = parser.parse("  ATHLETICS on agility +20 ")
+
+        assert second is first
+        assert parser.cache.hits == 1
+        assert parser.cache.misses == 1
+
+        # Inner whitespace is part of the key, so hits agree with cold parses
+        assert parser.parse("dodge agb s") is not None
+        assert parser.parse("dodge  agb  s") is None
+        assert Parser(cache_size=0).parse("dodge  agb  s") is None
+
+        # Failed parses are not cached
+        assert parser.parse("hello there") is None
+        assert "hello there" not in parser.cache
+
+
+
+    @pytest.mark.parametrize(["command", "kind", "expected"], [
+        ("3d10T+SB", DiceEquation, {"dice_count": 3, "is_complex": True, "repeats": 1}),
+        ("d5 - 2 * 4", DiceEquation, {"dice_count": 1, "flat": -2, "repeats": 4}),
+        ("SB + 3", DiceEquation, {"dice_count": 0, "flat": 3, "is_complex": True}),
+        ("10 * 31", DiceEquation, {"flat": 10, "repeats": 31}),
+        ("10 * 30", SkillTest, {"modifier": 10, "repeats": 30}),
+        ("#d20 dodge", SkillTest, {"skill": Key.DODGE, "profile_name": "d20"}),
+    ])
+    def test_dispatch(self, parser, command, kind, expected):
+
+        result = parser.parse(command)
+
+        assert isinstance(result, kind)
+        for key, value in expected.items():
+            assert getattr(result, key) == value
+
+
+
+    def test_compiled_grammar(self, tmp_path):
+
+        compiled = tmp_path / "fate.lark.cache"
+
+        # Stale or corrupt files are replaced
+        compiled.write_bytes(b"stale\n")
+        Parser(compiled=str(compiled))
+        assert compiled.read_bytes() != b"stale\n"
+
+        # Later parsers load the compiled tables
+        parser = Parser(compiled=str(compiled))
+        result = parser.parse("dodge + 10")
+        assert result.skill is Key.DODGE
+        assert result.modifier == 10
@@ -0,0 +1,83 @@
+from collections import Counter
+import pytest
+
+from fate.parsing import rng, rolls
+from fate.parsing.rolls import SkillTest, DiceTerm
+from fate.database.snapshots import ProfileSnapshot
+from fate.enums import Key, Attack
+
+
+needs_numpy = pytest.mark.skipif(rng.numpy is None, reason="NumPy not installed")
+
+
+def every_byte(count):
+    """Byte source which cycles through every byte value in turn."""
+
+    return bytes(range(256)) * (count // 256) + bytes(range(count % 256))
+
+
+class TestRandomSource:
+
+    @pytest.mark.parametrize("sides", [2, 5, 10, 100, 256])
+    def test_unbiased(self, sides):
+
+        source = rng.RandomSource(every_byte, block_size=256)
+
+        # Every face comes from the same number of bytes
+        counts = Counter(source.rolls(sides, 256 // sides * sides * 3))
+        assert set(counts) == set(range(1, sides + 1))
+        assert len(set(counts.values())) == 1
+
+
+    @needs_numpy
+    @pytest.mark.parametrize("sides", [2, 10, 100])
+    def test_array(self, sides):
+
+        source = rng.RandomSource(every_byte, block_size=256)
+
+        array = source.array(sides, (256 // sides, sides))
+        assert array.shape == (256 // sides, sides)
+        counts = Counter(array.ravel().tolist())
+        assert set(counts) == set(range(1, sides + 1))
+        assert len(set(counts.values())) == 1
+
+
+    def test_wide(self):
+
+        source = rng.make_source("seeded", 1)
+        results = source.rolls(1000, 2000)
+
+        assert min(results) >= 1 and max(results) <= 1000
+        assert len(set(results)) > 500
+
+
+    def test_modes(self):
+
+        assert rng.make_source("seeded", 7).rolls(100, 50) == rng.make_source("seeded", 7).rolls(100, 50)
+        assert 1 <= rng.make_source("crypto").roll(10) <= 10
+
+        with pytest.raises(ValueError):
+            rng.make_source("loaded")
+        with pytest.raises(ValueError):
+            rng.make_source().roll(0)
+
+
+    @pytest.mark.parametrize("engine", [pytest.param("numpy", marks=needs_numpy), "scalar"])
+    def test_rolls(self, engine, monkeypatch):
+
+        if engine == "scalar":
+            monkeypatch.setattr(rolls, "numpy", None)
+        else:
+            monkeypatch.setattr(rolls, "BATCH_THRESHOLD", 0)
+
+        requests = [
+            SkillTest(10, Key.BS, None, Attack.FULL, 30),
+            DiceTerm(3, 5, True).roll_many
+        ]
+
+        def run():
+            monkeypatch.setattr(rng, "source", rng.make_source("seeded", 3))
+            return [requests[0](ProfileSnapshot("bob", "Bob", {})), requests[1](None, 20)]
+
+        # Seeded sources give the same rolls (and hit locations) every time
+        assert run() == run()
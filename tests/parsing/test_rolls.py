@@ -0,0 +1,163 @@
+from math import ceil, floor
+import pytest
+
+from fate.parsing import rolls
+from fate.parsing.rolls import SkillTest, DiceTerm, BonusTerm, DiceEquation
+from fate.enums import Key, Attack
+
+
+# Optional dependency
+numpy = rolls.numpy
+needs_numpy = pytest.mark.skipif(numpy is None, reason="NumPy not installed")
+
+
+class Fixed:
+    """Random source which always rolls the same value."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def roll(self, sides):
+        return self.value
+
+
+@pytest.fixture(params=[pytest.param("numpy", marks=needs_numpy), "scalar"])
+def engine(request, monkeypatch):
+
+    if request.param == "scalar":
+        monkeypatch.setattr(rolls, "numpy", None)
+    else:
+        monkeypatch.setattr(rolls, "BATCH_THRESHOLD", 0)
+
+    return request.param
+
+
+def reference_degrees(target, roll):
+    """Degrees of success by the rules, as calculated before the lookup table."""
+
+    difference = target - roll
+
+    if difference >= 0:
+        degrees = ceil((difference + 1) / 10)
+        if roll == 1:
+            degrees += 1
+        elif roll == 100:
+            degrees = -1
+    else:
+        degrees = floor((difference - 1) / 10)
+        if roll == 100:
+            degrees -= 1
+        elif roll == 1:
+            degrees = 1
+
+    return degrees
+
+
+class TestRolls:
+
+    def test_degrees_table(self, monkeypatch):
+
+        # Every target in the table, and either side of it
+        for target in range(rolls.MIN_TARGET - 20, rolls.MAX_TARGET + 21):
+            for roll in range(1, 101):
+                expected = reference_degrees(target, roll)
+                assert rolls.degrees_of_success(target, roll) == expected
+                assert rolls.calculate_degrees(target, roll) == expected
+
+                monkeypatch.setattr(rolls.rng, "source", Fixed(roll))
+                assert rolls.test(target) == (roll, expected)
+
+
+    def test_repeats(self):
+
+        target, results = SkillTest(25, repeats=30).roll(None)
+
+        assert len(results) == 30
+        for roll, degrees in results:
+            assert 1 <= roll <= 100
+            assert degrees == rolls.degrees_of_success(target, roll)
+
+
+    @pytest.mark.parametrize(["number", "sides", "tearing"], [
+        (1, 10, False),
+        (3, 10, True),
+        (2, 5, True),
+        (4, 6, False),
+    ])
+    def test_dice_term(self, engine, number, sides, tearing):
+
+        term = DiceTerm(number, sides, tearing, sign=-1)
+
+        for total, sign, text, crit in term.roll_many(None, 50):
+
+            kept, _, suffix = text[1:].partition("] ")
+            kept, _, dropped = kept.partition(" / drop ")
+            kept = [int(roll.rstrip("!")) for roll in kept.split(", ")]
+
+            assert suffix == f"({number}d{sides}{'T' if tearing else ''})"
+            assert len(kept) == number
+            assert all(1 <= roll <= sides for roll in kept)
+            assert total == -sum(kept)
+            assert sign == -1
+            assert crit == ("!" in text)
+
+            if tearing:
+                assert int(dropped) <= min(kept)
+            else:
+                assert dropped == ""
+
+            if sides == 10:
+                assert crit == (10 in kept)
+            elif sides != 5:
+                assert not crit
+
+
+    def test_dice_equation(self, engine):
+
+        class Profile:
+            long_name = "Bob"
+            def get(self, key, default=None):
+                return {Key.S: 42}.get(key, default)
+
+        equation = DiceEquation([DiceTerm(2, 10, False), BonusTerm(Key.S, -1), 3], repeats=5)
+
+        # Bonus terms need a profile
+        assert equation.roll_many() is None
+        assert equation() is None
+
+        results = equation.roll_many(Profile())
+        assert len(results) == 5
+        for critical, description, total in results:
+            kept = [int(roll.rstrip("!")) for roll in description[1:].split("]")[0].split(", ")]
+            assert description.endswith(" - -4 (SB) + 3")
+            assert total == sum(kept) - 4 + 3
+
+        response = equation(Profile())
+        assert response["profile"] == "Bob"
+        assert len(response["description"].split("\n")) == 5
+
+        # Flat equations still repeat
+        assert DiceEquation([4], repeats=3).roll_many() == [(False, " + 4", 4)] * 3
+
+
+    def test_values(self):
+
+        term = DiceTerm(2, 10, True)
+        equation = DiceEquation([term, BonusTerm(Key.S, -1), 3, -1], 2)
+
+        assert term.negated() == DiceTerm(2, 10, True, -1)
+        assert term.sign == 1
+        assert equation == DiceEquation([DiceTerm(2, 10, True), BonusTerm(Key.S, -1), 2], 2)
+        assert equation != DiceEquation([term.negated(), BonusTerm(Key.S, -1), 2], 2)
+        assert SkillTest(10, Key.BS, None, Attack.FULL) == SkillTest(10, Key.BS, None, Attack.FULL)
+
+        # Values can be shared, so they cannot be changed
+        with pytest.raises(AttributeError):
+            term.sign = -1
+        with pytest.raises(AttributeError):
+            equation.flat = 0
+        with pytest.raises(AttributeError):
+            equation.extra = None
+
+        assert len({equation, DiceEquation(list(equation.terms) + [equation.flat], 2)}) == 1
+        assert not hasattr(equation, "__dict__")
\ No newline at end of file
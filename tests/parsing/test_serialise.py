@@ -0,0 +1,35 @@
+import pytest
+
+from fate.parsing import Parser, serialise
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return Parser()
+
+
+class TestSerialise:
+
+    @pytest.mark.parametrize("command", [
+        "athletics on agility +20",
+        " 10  +20-5+3 +17",
+        "  #Other \t\n +30 -50",
+        " agility !! * 11 ",
+        " #bob parry on weapon skill + 20 !!! ",
+        "3d10T+SB",
+        "-2d5 - AgB + 3 * 4",
+        "2d10 + 4 * 5",
+        "7",
+    ])
+    def test_round_trip(self, parser, command):
+
+        request = parser.parse(command)
+        loaded = serialise.loads(serialise.dumps(request))
+
+        assert loaded == request
+        assert hash(loaded) == hash(request)
+
+
+    def test_version(self):
+
+        assert serialise.VERSION.startswith(f"{serialise.FORMAT}:")
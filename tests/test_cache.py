@@ -0,0 +1,69 @@
+import fate.cache
+from fate.cache import LRUCache
+
+
+class TestLRUCache:
+
+    def test_eviction(self):
+
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Touching "a" makes "b" the least recently used
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get("b") is None
+
+        assert cache.stats() == {
+            "size": 2,
+            "maxsize": 2,
+            "hits": 3,
+            "misses": 1,
+            "evictions": 1,
+            "expirations": 0,
+            "hit_rate": 0.75
+        }
+
+
+    def test_disabled(self):
+
+        cache = LRUCache(0)
+        cache.put("a", 1)
+
+        assert len(cache) == 0
+        assert cache.get("a") is None
+
+
+    def test_ttl(self, monkeypatch):
+
+        now = 1000.0
+        monkeypatch.setattr(fate.cache, "monotonic", lambda: now)
+
+        cache = LRUCache(2, ttl=10)
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+
+        now += 10
+        assert cache.get("a") is None
+        assert "a" not in cache
+        assert cache.expirations == 1
+
+
+    def test_generation(self):
+
+        cache = LRUCache(2)
+        generation = cache.generation
+
+        # A value loaded before an invalidation is not stored
+        cache.put("a", 1)
+        cache.invalidate(["a"])
+        assert not cache.put_if("a", 1, generation)
+        assert "a" not in cache
+
+        assert cache.put_if("a", 2, cache.generation)
+        assert cache.get("a") == 2
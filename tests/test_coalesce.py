@@ -0,0 +1,148 @@
+import asyncio
+from types import SimpleNamespace
+from discord import Color, Embed
+
+from fate.coalesce import Coalescer, combine, MAX_FIELDS
+
+
+def make_embed(author, description, footer=None, colour=Color.green()):
+
+    embed = Embed(description=description, colour=colour)
+    embed.set_author(name=author)
+    if footer is not None:
+        embed.set_footer(text=footer)
+
+    return embed
+
+
+class Channel:
+
+    def __init__(self, channel_id):
+
+        self.id = channel_id
+        self.sent = list()
+
+
+    async def send(self, embed):
+
+        await asyncio.sleep(0)
+        self.sent.append((asyncio.get_running_loop().time(), embed))
+
+
+def make_context(channel):
+    return SimpleNamespace(channel=channel, send=channel.send)
+
+
+class TestCoalescer:
+
+    def test_burst(self):
+
+        first, second = Channel(1), Channel(2)
+
+        async def run():
+            coalescer = Coalescer(window=0.05, max_delay=1)
+            await asyncio.gather(
+                coalescer.send(make_context(first), make_embed("Alice", "Roll: `5`", "Dodge")),
+                coalescer.send(make_context(second), make_embed("Carl", "Roll: `7`")),
+                coalescer.send(make_context(first), make_embed("Bob", "Roll: `90`", colour=Color.red()))
+            )
+
+        asyncio.run(run())
+
+        # One message per channel
+        [(_, combined)] = first.sent
+        assert [(field.name, field.value) for field in combined.fields] == [
+            ("Alice | Dodge", "Roll: `5`"),
+            ("Bob", "Roll: `90`")
+        ]
+        assert combined.colour == Color.blue()
+
+        # Lone replies are sent unchanged
+        [(_, single)] = second.sent
+        assert single.author.name == "Carl"
+        assert single.description == "Roll: `7`"
+
+
+    def test_max_delay(self):
+
+        channel = Channel(1)
+
+        async def run():
+            coalescer = Coalescer(window=0.05, max_delay=0.1)
+            start = asyncio.get_running_loop().time()
+
+            # A steady stream of rolls never leaves the channel quiet for the window
+            tasks = list()
+            for i in range(8):
+                tasks.append(asyncio.create_task(coalescer.send(make_context(channel), make_embed(str(i), "Roll"))))
+                await asyncio.sleep(0.03)
+            await asyncio.gather(*tasks)
+
+            return start
+
+        start = asyncio.run(run())
+
+        assert len(channel.sent) > 1
+        assert channel.sent[0][0] - start < 0.2
+
+        # Sent in order
+        names = [field.name for _, embed in channel.sent for field in embed.fields or [embed.author]]
+        assert names == [str(i) for i in range(8)]
+
+
+    def test_error(self):
+
+        class Broken(Channel):
+            async def send(self, embed):
+                raise RuntimeError
+
+        async def run():
+            coalescer = Coalescer(window=0.01)
+            return await asyncio.gather(
+                coalescer.send(make_context(Broken(1)), make_embed("Alice", "Roll")),
+                return_exceptions=True
+            )
+
+        assert isinstance(asyncio.run(run())[0], RuntimeError)
+
+
+    def test_cancel(self):
+
+        channel = Channel(1)
+
+        async def run():
+            coalescer = Coalescer(window=0.05)
+            sends = [
+                asyncio.create_task(coalescer.send(make_context(channel), make_embed(str(i), "Roll")))
+                for i in range(3)
+            ]
+
+            # One command is cancelled while its batch waits
+            await asyncio.sleep(0.01)
+            sends[0].cancel()
+
+            results = await asyncio.gather(*sends, return_exceptions=True)
+            return coalescer, results
+
+        coalescer, results = asyncio.run(run())
+
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1:] == [None, None]
+
+        # The batch is still sent, and the channel's lock is dropped afterwards
+        [(_, combined)] = channel.sent
+        assert len(combined.fields) == 3
+        assert coalescer.locks == {}
+        assert coalescer.flushing == {}
+
+
+    def test_combine(self):
+
+        embeds = [make_embed(str(i), "Roll") for i in range(MAX_FIELDS + 2)]
+        embeds.insert(3, make_embed("Long", "x" * 2000))
+
+        combined = list(combine(embeds))
+
+        assert [len(embed.fields) for embed in combined] == [3, 0, MAX_FIELDS - 1]
+        assert combined[1] is embeds[3]
+        assert [field.name for field in combined[2].fields][-1] == str(MAX_FIELDS + 1)
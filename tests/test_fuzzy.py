@@ -0,0 +1,53 @@
+from difflib import get_close_matches
+from random import Random
+
+from fate.fuzzy import FuzzyIndex
+from fate.enums import Key
+
+
+def typos(value, random):
+    """Yield misspellings of value."""
+
+    letters = "abcdefghijklmnopqrstuvwxyz -"
+
+    for _ in range(5):
+        chars = list(value)
+        for _ in range(random.randint(1, 4)):
+            position = random.randrange(len(chars) + 1)
+            edit = random.choice(["insert", "delete", "replace"])
+            if edit == "insert" or not chars:
+                chars.insert(position, random.choice(letters))
+            elif edit == "delete":
+                del chars[min(position, len(chars) - 1)]
+            else:
+                chars[min(position, len(chars) - 1)] = random.choice(letters)
+        yield "".join(chars)
+
+
+class TestFuzzyIndex:
+
+    def test_matches_difflib(self):
+
+        random = Random(1)
+        index = FuzzyIndex(Key.values)
+
+        words = ["", "a", "psy", "tech-use", "will power", "aaa?????????zzzzzzz", "strngth"]
+        for value in Key.values:
+            words.extend(typos(value, random))
+
+        for word in words:
+            expected = get_close_matches(word, Key.values, 1)
+            assert index.match(word) == (expected[0] if expected else None)
+
+
+    def test_memo(self):
+
+        index = FuzzyIndex(["alpha", "beta"])
+
+        assert index.match("alfa") == "alpha"
+        assert index.match("alfa") == "alpha"
+        assert index.match("zzzz") is None
+        assert index.match("zzzz") is None
+
+        assert index.memo.hits == 2
+        assert index.memo.misses == 2
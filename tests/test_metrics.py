@@ -0,0 +1,92 @@
+from urllib.request import urlopen
+import pytest
+
+from fate.metrics import Metrics, Histogram
+from fate.parsing import Parser
+
+
+@pytest.fixture
+def metrics():
+
+    metrics = Metrics()
+    metrics.enabled = True
+
+    return metrics
+
+
+class TestMetrics:
+
+    def test_disabled(self):
+
+        metrics = Metrics()
+        metrics.observe("fate_parse_seconds", "hit", 0.001)
+        metrics.increment("fate_command_errors_total", "roll")
+
+        with metrics.timer("fate_db_seconds", "update"):
+            pass
+
+        assert metrics.summary("fate_parse_seconds") == []
+        assert metrics.summary("fate_db_seconds") == []
+        assert metrics.counters["fate_command_errors_total"] == {}
+
+
+    def test_quantile(self):
+
+        histogram = Histogram()
+        for seconds in [0.0002] * 90 + [0.02] * 10:
+            histogram.observe(seconds)
+
+        assert histogram.quantile(0.5) == 0.00025
+        assert histogram.quantile(0.95) == 0.025
+        assert Histogram().quantile(0.5) == 0.0001
+
+
+    def test_render(self, metrics):
+
+        metrics.observe("fate_command_seconds", "roll", 0.003)
+        metrics.observe("fate_command_seconds", "roll", 20)
+        metrics.increment("fate_command_errors_total", "roll")
+
+        lines = metrics.render().splitlines()
+
+        assert "# TYPE fate_command_seconds histogram" in lines
+        assert 'fate_command_seconds_bucket{command="roll",le="0.0025"} 0' in lines
+        assert 'fate_command_seconds_bucket{command="roll",le="0.005"} 1' in lines
+        assert 'fate_command_seconds_bucket{command="roll",le="+Inf"} 2' in lines
+        assert 'fate_command_seconds_count{command="roll"} 2' in lines
+        assert 'fate_command_errors_total{command="roll"} 1' in lines
+
+
+    def test_timer(self, metrics):
+
+        with metrics.timer("fate_db_seconds", "update"):
+            pass
+
+        [(label, count, *_)] = metrics.summary("fate_db_seconds")
+        assert (label, count) == ("update", 1)
+
+
+    def test_parser(self, metrics, monkeypatch):
+
+        monkeypatch.setattr("fate.parsing.parser.metrics", metrics)
+
+        parser = Parser()
+        parser.parse("2d10 + 5")
+        parser.parse("2d10 + 5")
+
+        assert [row[:2] for row in metrics.summary("fate_parse_seconds")] == [("hit", 1), ("miss", 1)]
+
+
+    def test_serve(self, metrics):
+
+        metrics.observe("fate_send_seconds", "roll", 0.01)
+        server = metrics.serve(0)
+
+        try:
+            with urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'fate_send_seconds_count{command="roll"} 1' in body
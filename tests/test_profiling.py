@@ -0,0 +1,85 @@
+import asyncio
+import json
+import pstats
+from contextlib import nullcontext
+from threading import Event, current_thread
+
+from fate.profiling import Profiler
+
+
+class TestProfiler:
+
+    def test_disabled(self):
+
+        profiler = Profiler()
+
+        assert isinstance(profiler.command("roll"), nullcontext)
+        assert isinstance(profiler.phase("parse"), nullcontext)
+
+
+    def test_sampling(self, tmp_path):
+
+        profiler = Profiler()
+        profiler.configure(1.0, str(tmp_path), interval=3600)
+
+        async def roll():
+            with profiler.command("roll"):
+
+                # Only one command is profiled at a time
+                assert isinstance(profiler.command("show"), nullcontext)
+
+                with profiler.phase("parse"):
+                    sum(range(1000))
+                with profiler.phase("db"):
+                    await asyncio.sleep(0)
+
+        for _ in range(3):
+            asyncio.run(roll())
+
+        # Not dumped until the interval has passed
+        assert list(tmp_path.iterdir()) == []
+        profiler.dump()
+
+        stats = pstats.Stats(str(tmp_path / "roll.prof"))
+        assert any(function == "roll" for _, _, function in stats.stats)
+
+        with open(tmp_path / "phases.json") as phases_file:
+            phases = json.load(phases_file)
+
+        assert phases["roll"]["samples"] == 3
+        assert set(phases["roll"]["phases"]) == {"parse", "db"}
+        assert sum(phases["roll"]["phases"].values()) <= phases["roll"]["total"]
+
+
+    def test_rate(self, tmp_path, monkeypatch):
+
+        profiler = Profiler()
+        profiler.configure(0.25, str(tmp_path))
+
+        monkeypatch.setattr("fate.profiling.random", lambda: 0.5)
+        assert isinstance(profiler.command("roll"), nullcontext)
+
+        monkeypatch.setattr("fate.profiling.random", lambda: 0.1)
+        assert not isinstance(profiler.command("roll"), nullcontext)
+
+
+    def test_dump_thread(self, tmp_path, monkeypatch):
+
+        profiler = Profiler()
+        profiler.configure(1.0, str(tmp_path), interval=0)
+
+        dumped = Event()
+        threads = list()
+
+        def dump():
+            threads.append(current_thread())
+            dumped.set()
+
+        monkeypatch.setattr(profiler, "dump", dump)
+
+        with profiler.command("roll"):
+            pass
+
+        # Due dumps are written off the calling thread
+        assert dumped.wait(5)
+        assert threads[0] is not current_thread()
@@ -0,0 +1,179 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from discord import Intents
+from discord.ext.commands.bot import BotBase
+
+from fate import ShardedFastBot, Database, AsyncDatabase
+from fate.sharding import shard_for, parse_shard_count, parse_shard_ids, check_shards
+from fate.enums import Key
+
+
+SHARD_COUNT = 4
+
+
+def guild_on(shard, index=0):
+    """Return a guild ID served by the given shard."""
+
+    return ((index * SHARD_COUNT + shard) << 22) | 12345
+
+
+class FakeGateway:
+    """Delivers messages to the process running their guild's shard, as Discord's gateway does.
+
+    Each process has its own database configuration (sharing one database), like
+    separate bot processes would.
+    """
+
+    def __init__(self, url, shard_ranges):
+
+        self.bots = list()
+
+        for shard_ids in shard_ranges:
+            database = Database(url)
+            database.set_shards(shard_ids, SHARD_COUNT)
+            self.bots.append(ShardedFastBot(
+                AsyncDatabase(database, 1),
+                command_prefix="--",
+                intents=Intents.default(),
+                shard_ids=shard_ids,
+                shard_count=SHARD_COUNT,
+                fast_command="fast-roll"
+            ))
+
+
+    def route(self, guild_id):
+        """Return the bot which receives a guild's messages."""
+
+        shard = shard_for(guild_id, SHARD_COUNT)
+        [bot] = [bot for bot in self.bots if shard in bot.shard_ids]
+
+        return bot
+
+
+    async def send(self, guild_id, channel_id, content="3d10"):
+        """Deliver a message, returning the bot which received it and its context."""
+
+        bot = self.route(guild_id)
+        message = SimpleNamespace(
+            content=content,
+            guild=SimpleNamespace(id=guild_id, shard_id=shard_for(guild_id, SHARD_COUNT)),
+            channel=SimpleNamespace(id=channel_id)
+        )
+
+        return bot, await bot.get_context(message)
+
+
+
+@pytest.fixture
+def parse_messages(monkeypatch):
+    """Stand in for discord.py's command parsing: messages starting with "--" invoke commands."""
+
+    async def get_context(self, message, **kwargs):
+        invoked = message.content.startswith("--")
+        return SimpleNamespace(
+            invoked_with=message.content[2:] if invoked else None,
+            channel=message.channel,
+            command=None
+        )
+
+    monkeypatch.setattr(BotBase, "get_context", get_context)
+
+
+def test_shard_for():
+
+    assert shard_for(None, SHARD_COUNT) == 0
+    assert [shard_for(guild_on(shard, 3), SHARD_COUNT) for shard in range(SHARD_COUNT)] == [0, 1, 2, 3]
+
+    # Discord's documented example
+    assert shard_for(197038439483310086, 2) == 0
+    assert shard_for(197038439483310086, 3) == 2
+
+
+def test_parse():
+
+    assert parse_shard_count(None) is None
+    assert parse_shard_count("auto") is None
+    assert parse_shard_count("16") == 16
+    assert parse_shard_ids(None) is None
+    assert parse_shard_ids("") is None
+    assert parse_shard_ids("4-7") == [4, 5, 6, 7]
+    assert parse_shard_ids("8, 0-2,1") == [0, 1, 2, 8]
+
+    with pytest.raises(ValueError):
+        parse_shard_count("0")
+    with pytest.raises(ValueError):
+        check_shards([0, 1], None)
+    with pytest.raises(ValueError):
+        check_shards([2, 4], 4)
+
+
+def test_bot_shards():
+
+    bot = ShardedFastBot(None, command_prefix="--", intents=Intents.default(), shard_ids=[2, 3], shard_count=4)
+    assert (bot.shard_ids, bot.shard_count) == ([2, 3], 4)
+
+    with pytest.raises(ValueError):
+        ShardedFastBot(None, command_prefix="--", intents=Intents.default(), shard_ids=[4], shard_count=4)
+
+
+def test_fake_gateway(tmp_path, parse_messages):
+
+    url = f"sqlite:///{tmp_path / 'fate.db'}"
+    Database(url).create_tables()
+
+    gateway = FakeGateway(url, [[0, 1], [2, 3]])
+    first, second = gateway.bots
+
+    async def run():
+
+        # Fast mode is toggled through the process which serves each channel
+        for shard in range(SHARD_COUNT):
+            guild_id = guild_on(shard)
+            await gateway.route(guild_id).database.toggle_fast(100 + shard, guild_id)
+
+        # Channels saved before guilds were recorded are served everywhere
+        await first.database.toggle_fast(200)
+
+        # Every process restarts, loading only its own shards' fast channels
+        for bot in gateway.bots:
+            await bot.database.load_fast_channels()
+
+        assert first.database.fast_channels == {100, 101, 200}
+        assert second.database.fast_channels == {102, 103, 200}
+
+        # Messages reach the process running their guild's shard
+        for shard in range(SHARD_COUNT):
+            bot, context = await gateway.send(guild_on(shard), 100 + shard)
+            assert bot is (first if shard < 2 else second)
+            assert context.command == "fast-roll"
+
+            # Commands and other channels are left alone
+            _, context = await gateway.send(guild_on(shard), 100 + shard, "--stats")
+            assert context.command is None
+            _, context = await gateway.send(guild_on(shard, 1), 300 + shard)
+            assert context.command is None
+
+    asyncio.run(run())
+
+
+def test_fake_gateway_profiles(tmp_path):
+
+    url = f"sqlite:///{tmp_path / 'fate.db'}"
+    Database(url).create_tables()
+
+    gateway = FakeGateway(url, [[0, 1], [2, 3]])
+    near, far = gateway.route(guild_on(0)), gateway.route(guild_on(2))
+
+    async def run():
+
+        await near.database.new_profile(100, "bob")
+        await near.database.switch_profile(100, "bob")
+        await near.database.update(100, Key.BS, 30)
+        assert (await far.database.fetch_snapshot(100)).get(Key.BS) == 30
+
+        # A player sets a stat in a guild on one process, then rolls in a guild on another
+        await near.database.update(100, Key.BS, 60)
+        assert (await far.database.fetch_snapshot(100)).get(Key.BS) == 60
+
+    asyncio.run(run())
\ No newline at end of file